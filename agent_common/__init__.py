@@ -0,0 +1,14 @@
+from typing import TYPE_CHECKING
+from agent_common.lazy import lazy_exports
+
+__all__ = ["span", "traced", "tracer", "chat_model"]
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "span": "agent_common.tracing",
+    "traced": "agent_common.tracing",
+    "tracer": "agent_common.tracing",
+    "chat_model": "agent_common.llm",
+})
+
+if TYPE_CHECKING:
+    from agent_common.llm import chat_model
+    from agent_common.tracing import span, traced, tracer
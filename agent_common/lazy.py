@@ -0,0 +1,25 @@
+from typing import Any, Callable, Dict, List, Tuple
+import importlib
+import sys
+
+def lazy_exports(package: str, exports: Dict[str, str]) -> Tuple[Callable[[str], Any], Callable[[], List[str]]]:
+    """Build a package's module-level __getattr__ and __dir__ for lazily loaded exports
+
+    `exports` maps each exported name to the module that defines it. The module is
+    imported the first time the name is accessed, so importing the package itself,
+    e.g. to reach a light submodule or run a CLI's --help, stays cheap.
+    """
+    namespace = sys.modules[package].__dict__
+
+    def __getattr__(name: str) -> Any:
+        module = exports.get(name)
+        if module is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(module), name)
+        namespace[name] = value
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted({*namespace, *exports})
+
+    return __getattr__, __dir__
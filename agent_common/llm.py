@@ -0,0 +1,145 @@
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+import os
+import threading
+import httpx
+import openai
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables import Runnable
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from agent_common.routing import fallback_base_url, model_for, request_timeout
+from agent_common.tokens import token_ledger
+from agent_common.tracing import Span, tracer
+
+# Importing this module loads langchain, so the agents only import it when they
+# first need a client; commands that never call the LLM start without it
+
+class LLMSpanHandler(BaseCallbackHandler):
+    """LangChain callback that records a span for every chat model call
+
+    Spans carry the stage, model and endpoint, the prompt, cached prompt and
+    completion token counts and, for streamed calls, the number of chunks received.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self._spans: Dict[UUID, Span] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, **kwargs: Any):
+        params = kwargs.get("invocation_params") or {}
+        metadata = kwargs.get("metadata") or {}
+        self._spans[run_id] = tracer.start_span(
+            "llm.chat",
+            model=params.get("model") or params.get("model_name"),
+            stage=metadata.get("stage"),
+            endpoint=metadata.get("endpoint"),
+        )
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any):
+        span = self._spans.get(run_id)
+        if span is not None:
+            span.attributes["streamed_chunks"] = span.attributes.get("streamed_chunks", 0) + 1
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        span = self._spans.pop(run_id, None)
+        if span is None:
+            return
+        usage = {}
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                if getattr(message, "usage_metadata", None):
+                    usage = message.usage_metadata
+        # Prompt tokens the server answered from its prefix cache, where it reports them
+        cached = (usage.get("input_token_details") or {}).get("cache_read")
+        span.set(
+            prompt_tokens=usage.get("input_tokens"),
+            completion_tokens=usage.get("output_tokens"),
+            cached_tokens=cached,
+        )
+        if usage:
+            token_ledger.record_usage(usage.get("input_tokens") or 0, cached or 0)
+        tracer.end_span(span)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        span = self._spans.pop(run_id, None)
+        if span is None:
+            return
+        span.status = "ERROR"
+        span.set(error=repr(error))
+        tracer.end_span(span)
+
+llm_span_handler = LLMSpanHandler()
+
+# Timeouts, dropped connections and 5xx responses move a call to the fallback
+# endpoint; client errors such as a bad request or an unknown model do not
+FALLBACK_ERRORS = (openai.APIConnectionError, openai.InternalServerError)
+
+_http_clients: Dict[str, Tuple[httpx.Client, httpx.AsyncClient]] = {}
+_http_clients_lock = threading.Lock()
+
+def http_clients(base_url: Optional[str]) -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """Sync and async HTTP clients for an endpoint, shared by every model that calls it
+
+    Each OpenAI client would otherwise open its own connection pool, so the
+    agents' models would each pay for new connections to the same server. The
+    async client's connections belong to the event loop that opened them, which
+    is why synchronous callers share one loop (see sales_agent.run_async).
+    """
+    key = base_url or ""
+    with _http_clients_lock:
+        clients = _http_clients.get(key)
+        if clients is None:
+            clients = _http_clients[key] = (openai.DefaultHttpxClient(), openai.DefaultAsyncHttpxClient())
+    return clients
+
+def _chat_client(stage: str, model: Optional[str], base_url: Optional[str], api_key: Optional[str], max_retries: int) -> ChatOpenAI:
+    sync_client, async_client = http_clients(base_url)
+    return ChatOpenAI(
+        model=model,
+        base_url=base_url,
+        api_key=api_key,
+        timeout=request_timeout(),
+        max_retries=max_retries,
+        http_client=sync_client,
+        http_async_client=async_client,
+        callbacks=[llm_span_handler],
+        metadata={"stage": stage, "endpoint": base_url},
+    )
+
+def chat_model(stage: str = "proposal") -> Runnable:
+    """Build a chat client for a stage, routed to its model (see agent_common.routing)
+
+    With OPENAI_FALLBACK_BASE_URL set, a call that times out or fails with a
+    server error is retried once on that endpoint, with OPENAI_FALLBACK_MODEL (by
+    default the same model) and OPENAI_FALLBACK_API_KEY (by default the same key).
+    The primary endpoint is then not retried itself, so failing over is immediate.
+    A streamed call only fails over before its first chunk.
+    """
+    model = model_for(stage)
+    fallback = fallback_base_url()
+    primary = _chat_client(stage, model, os.getenv("OPENAI_BASE_URL"), os.getenv("OPENAI_API_KEY"), 0 if fallback else 2)
+    if not fallback:
+        return primary
+    secondary = _chat_client(
+        stage,
+        os.getenv("OPENAI_FALLBACK_MODEL") or model,
+        fallback,
+        os.getenv("OPENAI_FALLBACK_API_KEY") or os.getenv("OPENAI_API_KEY"),
+        2,
+    )
+    return primary.with_fallbacks([secondary], exceptions_to_handle=FALLBACK_ERRORS)
+
+def embeddings_model() -> OpenAIEmbeddings:
+    """Build an embeddings client from OPENAI_EMBEDDING_MODEL and the OPENAI_* variables"""
+    base_url = os.getenv("OPENAI_BASE_URL")
+    sync_client, async_client = http_clients(base_url)
+    return OpenAIEmbeddings(
+        model=os.getenv("OPENAI_EMBEDDING_MODEL"),
+        base_url=base_url,
+        api_key=os.getenv("OPENAI_API_KEY"),
+        http_client=sync_client,
+        http_async_client=async_client,
+    )
@@ -0,0 +1,57 @@
+from typing import Dict, List, Tuple
+from contextlib import contextmanager
+from rich.console import Console
+from rich.table import Table
+from agent_common.tracing import Span, SpanCollector, tracer
+
+def profile_table(spans: List[Span]) -> Table:
+    """Aggregate spans by their path from the root into a per-stage breakdown"""
+    by_id = {span.span_id: span for span in spans}
+
+    def path(span: Span) -> Tuple[str, ...]:
+        names = []
+        while span is not None:
+            names.append(span.name)
+            span = by_id.get(span.parent_id)
+        return tuple(reversed(names))
+
+    stages: Dict[Tuple[str, ...], Dict[str, float]] = {}
+    for span in sorted(spans, key=lambda span: span.start_ns):
+        stage = stages.setdefault(path(span), {"calls": 0, "ms": 0.0, "tokens_in": 0, "tokens_out": 0, "tokens_cached": 0, "tokens_saved": 0})
+        stage["calls"] += 1
+        stage["ms"] += span.duration_ms
+        stage["tokens_in"] += span.attributes.get("prompt_tokens", 0)
+        stage["tokens_out"] += span.attributes.get("completion_tokens", 0)
+        stage["tokens_cached"] += span.attributes.get("cached_tokens", 0)
+        stage["tokens_saved"] += span.attributes.get("prompt_tokens_saved", 0)
+
+    total = sum(stage["ms"] for key, stage in stages.items() if len(key) == 1) or 1.0
+    table = Table(title="Profile")
+    for column in ("stage", "calls", "total ms", "% of run", "tokens in", "tokens out", "tokens cached", "tokens saved"):
+        table.add_column(column, justify="left" if column == "stage" else "right")
+    # Depth-first order keeps each stage directly under its parent
+    for key in sorted(stages, key=lambda key: [list(stages).index(key[:i + 1]) for i in range(len(key))]):
+        stage = stages[key]
+        table.add_row(
+            "  " * (len(key) - 1) + key[-1],
+            str(stage["calls"]),
+            f"{stage['ms']:.1f}",
+            f"{stage['ms'] / total * 100:.0f}%",
+            str(stage["tokens_in"] or ""),
+            str(stage["tokens_out"] or ""),
+            str(stage["tokens_cached"] or ""),
+            str(stage["tokens_saved"] or ""),
+        )
+    return table
+
+@contextmanager
+def profiled(console: Console, name: str):
+    """Record every span under a root span and print the breakdown on exit"""
+    collector = SpanCollector()
+    tracer.add_exporter(collector)
+    try:
+        with tracer.span(name):
+            yield collector
+    finally:
+        tracer.remove_exporter(collector)
+        console.print(profile_table(collector.spans))
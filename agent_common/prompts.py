@@ -0,0 +1,160 @@
+from typing import Any, Dict, List, Tuple
+
+class PromptTemplate:
+    """A prompt split into a static system message and a variable user message
+
+    The system message holds every instruction, schema and format rule, and may
+    only be filled from `context` that is fixed for a deployment (the table's
+    columns, the roles, the rate card), never from the request. It is therefore
+    byte-identical across calls and leads the conversation, so OpenAI-compatible
+    servers, vLLM and llama.cpp can serve it from their prompt cache and only
+    prefill the short user message, which holds the request itself.
+
+    `version` must be bumped whenever the wording changes; `key` combines it with
+    the name, so caches of LLM output can include it and drop stale answers.
+    """
+
+    def __init__(self, name: str, version: int, system: str, user: str):
+        self.name = name
+        self.version = version
+        self.system = system
+        self.user = user
+        self._systems: Dict[Tuple[Tuple[str, Any], ...], str] = {}
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}@v{self.version}"
+
+    def system_message(self, **context: Any) -> str:
+        """The static system message for a deployment's context, rendered once"""
+        cache_key = tuple(sorted(context.items()))
+        system = self._systems.get(cache_key)
+        if system is None:
+            system = self._systems[cache_key] = self.system.format(**context)
+        return system
+
+    def messages(self, context: Dict[str, Any], **variables: Any) -> List[Tuple[str, str]]:
+        """Chat messages for one call: the static system message, then the request"""
+        return [("system", self.system_message(**context)), ("human", self.user.format(**variables))]
+
+PROMPTS: Dict[str, PromptTemplate] = {}
+
+def register(template: PromptTemplate) -> PromptTemplate:
+    PROMPTS[template.name] = template
+    return template
+
+def get_prompt(name: str) -> PromptTemplate:
+    return PROMPTS[name]
+
+def prompt_version(*names: str) -> str:
+    """Combined version of several templates, e.g. for a cache of their output"""
+    return "+".join(PROMPTS[name].key for name in names)
+
+SQL_SYSTEM = """You are a SQL expert. Convert the user's natural language query into SQL.
+The sales_leads table has columns:
+- id INTEGER # the unique identifier for the lead
+- customer_name VARCHAR # the name of the lead
+- company VARCHAR # the name of the company of the lead
+- needs VARCHAR # the needs of the lead
+- budget DECIMAL # the budget for the lead
+- timeline_start DATE # the required start date of the lead's project
+- timeline_end DATE # the required end date of the lead's project
+- created_at TIMESTAMP # the date and time when the lead was created{partitions}{summaries}
+
+For listing or searching leads, always include id, customer_name, company, and needs in the output.
+Sort results by id for consistency.
+If searching, use ILIKE for case-insensitive matching.
+
+Important: Return only a single valid SQL query. Do not include backticks, markdown formatting, any explanation, or multiple options.
+The query should be a simple SELECT statement that can be executed directly against the tables above."""
+
+register(PromptTemplate("lead.sql", 2, SQL_SYSTEM, "Query: {query}"))
+
+# Shares the SQL prompt's system message, and with it the cached prefix
+register(PromptTemplate(
+    "lead.sql_repair",
+    2,
+    SQL_SYSTEM,
+    """Query: {query}
+
+Your previous SQL query failed.
+SQL: {sql}
+Error: {error}
+
+Fix the query so it runs and answers the original query. Return only the corrected SQL.""",
+))
+
+register(PromptTemplate(
+    "lead.summary",
+    1,
+    """Given data about leads and the user's original query, provide a natural language summary.
+Format the response in a clear, business-friendly way.""",
+    """Original query: {query}
+Data:
+{data}""",
+))
+
+register(PromptTemplate(
+    "engineer.analysis",
+    1,
+    """You are an expert software engineer helping the sales team with project estimation.
+Given the client requirements, create a detailed project plan.
+Break it down into phases and specific tasks.
+
+Format your response as:
+1. Project Overview
+2. Technical Requirements
+3. Project Phases (with subtasks)
+4. Technical Considerations""",
+    "Requirements: {requirements}",
+))
+
+register(PromptTemplate(
+    "engineer.estimate",
+    1,
+    """Based on the project plan you are given, estimate the effort for each phase.
+For every phase, list the roles needed and the person-days each role works.
+Only use these roles: {roles}.
+Also list any risk factors that could affect the timeline.
+
+{format_instructions}""",
+    """Project Plan:
+{project_plan}""",
+))
+
+register(PromptTemplate(
+    "sales.extract_lead_id",
+    1,
+    "Extract the lead ID from the user's query. Reply with the ID only.",
+    "{query}",
+))
+
+register(PromptTemplate(
+    "sales.proposal",
+    1,
+    """Create a professional proposal document from the lead details, project plan, effort estimate and costs you are given.
+Costs are computed from our rate card (daily rates): {rate_card}.
+
+Format the proposal with these sections:
+1. Executive Summary
+2. Project Understanding
+3. Proposed Solution
+4. Implementation Approach
+5. Timeline
+6. Team Composition
+7. Investment
+8. Terms and Conditions
+
+Make it professional and persuasive. Use markdown formatting.""",
+    """Lead Details:
+{lead_details}
+
+Project Plan (outline):
+{plan}
+
+Effort Estimate (person-days per phase and role):
+{effort}
+
+Costs:
+{costs}""",
+))
@@ -0,0 +1,39 @@
+from typing import Dict, Optional
+import os
+
+# Which model tier serves each LLM stage. Short, structured answers go to the
+# fast tier; the plan and the proposal are prose a client reads, so they keep the
+# large model.
+STAGE_TIERS: Dict[str, str] = {
+    "extraction": "fast",  # lead ID from a proposal request
+    "sql": "fast",  # NL->SQL, its repair, and the lead agent's summaries
+    "analysis": "large",  # project plan
+    "estimate": "large",  # effort estimate, which the costs are computed from
+    "proposal": "large",
+}
+
+def model_for(stage: str) -> Optional[str]:
+    """Model serving a stage
+
+    OPENAI_MODEL_<STAGE> (e.g. OPENAI_MODEL_SQL) takes precedence, then the
+    stage's tier, OPENAI_FAST_MODEL or OPENAI_LARGE_MODEL, then OPENAI_MODEL.
+    """
+    tier = STAGE_TIERS.get(stage)
+    return (
+        os.getenv(f"OPENAI_MODEL_{stage.upper()}")
+        or (tier and os.getenv(f"OPENAI_{tier.upper()}_MODEL"))
+        or os.getenv("OPENAI_MODEL")
+    )
+
+def models_for(*stages: str) -> str:
+    """Models serving several stages, e.g. to key a cache of their combined output"""
+    return ",".join(sorted({model_for(stage) or "" for stage in stages}))
+
+def fallback_base_url() -> Optional[str]:
+    """Second endpoint to retry a call on after a timeout or server error, if any"""
+    return os.getenv("OPENAI_FALLBACK_BASE_URL")
+
+def request_timeout() -> Optional[float]:
+    """Seconds before a chat request counts as timed out; OPENAI_TIMEOUT, else the client's default"""
+    timeout = os.getenv("OPENAI_TIMEOUT")
+    return float(timeout) if timeout else None
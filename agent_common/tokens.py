@@ -0,0 +1,100 @@
+from typing import Any, Dict, Optional
+import re
+import threading
+from agent_common.tracing import tracer
+
+# About four characters per token for English text with GPT-style tokenisers.
+# Budgets only need an estimate; exact counts come back in each response's usage
+# metadata and are recorded on the llm.chat spans.
+CHARS_PER_TOKEN = 4
+
+# Lines that carry a document's structure: headings, list items and table rows
+STRUCTURE = re.compile(r"^\s*(#{1,6}\s|[-*+]\s|\d+[.)]\s|\|)")
+TRUNCATED = "\n[...truncated to fit the prompt budget]"
+
+def estimate_tokens(text: str) -> int:
+    """Estimate how many tokens a piece of text takes in a prompt"""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+def outline(text: str) -> str:
+    """Keep only the headings, list items and table rows of a markdown document
+
+    Text without any such structure is returned unchanged.
+    """
+    lines = [line.rstrip() for line in text.splitlines() if STRUCTURE.match(line)]
+    return "\n".join(lines) if lines else text
+
+def fit(text: str, budget: int) -> str:
+    """Shrink text to about `budget` tokens, or return it unchanged if it fits
+
+    Prose is dropped first, keeping the document's outline; if that is still too
+    long it is cut at the last whole line that fits, and the cut is marked.
+    """
+    if estimate_tokens(text) <= budget:
+        return text
+    text = outline(text)
+    if estimate_tokens(text) <= budget:
+        return text
+    limit = max(budget * CHARS_PER_TOKEN - len(TRUNCATED), 0)
+    cut = text.rfind("\n", 0, limit)
+    return text[:cut if cut > 0 else limit] + TRUNCATED
+
+class TokenLedger:
+    """Per-stage prompt budgets, a record of the tokens compaction saved, and the
+    prompt tokens servers reported serving from their prefix cache
+
+    Each prompt section is recorded under a stage name with the size of the full
+    text an agent would otherwise have sent and the size of what it did send: a
+    compact, structured form of the same content, cut down further only when it
+    is over the stage's budget. The saving is also added to the current span, so
+    it shows up in --profile and in exported traces.
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, Dict[str, int]] = {}
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self._lock = threading.Lock()
+
+    def record_usage(self, prompt_tokens: int, cached_tokens: int):
+        """Record the prompt tokens a server reported, and how many it served from cache"""
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+
+    def compact(self, stage: str, full: str, compact: Optional[str] = None, budget: Optional[int] = None) -> str:
+        """Return the text to send for one prompt section, and record the saving"""
+        sent = full if compact is None else compact
+        fitted = sent if budget is None else fit(sent, budget)
+        full_tokens, sent_tokens = estimate_tokens(full), estimate_tokens(fitted)
+        with self._lock:
+            totals = self._stages.setdefault(stage, {"calls": 0, "full_tokens": 0, "sent_tokens": 0, "over_budget": 0})
+            totals["calls"] += 1
+            totals["full_tokens"] += full_tokens
+            totals["sent_tokens"] += sent_tokens
+            totals["over_budget"] += fitted is not sent
+        span = tracer.current_span()
+        if span is not None:
+            span.set(prompt_tokens_saved=span.attributes.get("prompt_tokens_saved", 0) + full_tokens - sent_tokens)
+        return fitted
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estimated prompt tokens per stage before and after compaction, and cache hits"""
+        with self._lock:
+            stages = {stage: dict(totals, saved_tokens=totals["full_tokens"] - totals["sent_tokens"]) for stage, totals in self._stages.items()}
+            prompt_tokens, cached_tokens = self.prompt_tokens, self.cached_tokens
+        full = sum(totals["full_tokens"] for totals in stages.values())
+        sent = sum(totals["sent_tokens"] for totals in stages.values())
+        return {
+            "stages": stages,
+            "full_tokens": full,
+            "sent_tokens": sent,
+            "saved_tokens": full - sent,
+            "saved_rate": (full - sent) / full if full else 0.0,
+            # Reported by the server, for every call rather than only budgeted sections
+            "llm_prompt_tokens": prompt_tokens,
+            "llm_cached_tokens": cached_tokens,
+            "cache_hit_rate": cached_tokens / prompt_tokens if prompt_tokens else 0.0,
+        }
+
+token_ledger = TokenLedger()
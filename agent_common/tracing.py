@@ -0,0 +1,165 @@
+from typing import Any, Callable, Dict, List, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+import functools
+import inspect
+import json
+import os
+import secrets
+import threading
+import time
+
+class Span:
+    """A timed unit of work, shaped after an OpenTelemetry span"""
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = {}
+        self.status = "OK"
+        self.set(**(attributes or {}))
+
+    def set(self, **attributes: Any):
+        """Record attributes, skipping any that are None"""
+        self.attributes.update({key: value for key, value in attributes.items() if value is not None})
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialise with OTLP/JSON field names"""
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "attributes": self.attributes,
+            "status": {"code": self.status},
+        }
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+class Tracer:
+    """Creates spans that nest through contextvars and hands finished spans to exporters
+
+    Because the current span lives in a contextvar, nesting follows both threads
+    started with asyncio.to_thread and tasks created by asyncio.gather.
+    """
+
+    def __init__(self):
+        self.exporters: List[Callable[[Span], None]] = []
+
+    def add_exporter(self, exporter: Callable[[Span], None]):
+        self.exporters.append(exporter)
+
+    def remove_exporter(self, exporter: Callable[[Span], None]):
+        self.exporters.remove(exporter)
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def start_span(self, name: str, **attributes: Any) -> Span:
+        """Start a span under the current one without making it current"""
+        return Span(name, _current_span.get(), attributes)
+
+    def end_span(self, span: Span):
+        span.end_ns = time.time_ns()
+        for exporter in self.exporters:
+            exporter(span)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any):
+        """Time the enclosed block as a child of the current span"""
+        span = self.start_span(name, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except GeneratorExit:
+            # A streaming consumer stopped early; that is not a failure
+            raise
+        except BaseException as e:
+            span.status = "ERROR"
+            span.set(error=repr(e))
+            raise
+        finally:
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # A generator finalised outside the context that started it
+                pass
+            self.end_span(span)
+
+tracer = Tracer()
+span = tracer.span
+
+def traced(name: str):
+    """Decorate a function, coroutine or (async) generator so each call records a span"""
+    def decorator(func: Callable) -> Callable:
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def async_gen_wrapper(*args, **kwargs):
+                with span(name):
+                    async for item in func(*args, **kwargs):
+                        yield item
+            return async_gen_wrapper
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def gen_wrapper(*args, **kwargs):
+                with span(name):
+                    yield from func(*args, **kwargs)
+            return gen_wrapper
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class JSONLExporter:
+    """Append finished spans to a file, one OTLP/JSON-style object per line"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock, open(self.path, "a") as f:
+            f.write(line + "\n")
+
+class SpanCollector:
+    """Keep finished spans in memory, e.g. for a profile at the end of a command"""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+_trace_files: Dict[str, JSONLExporter] = {}
+
+def configure_from_env():
+    """Export every span to the JSONL file named by AGENT_TRACE_FILE, if set"""
+    path = os.getenv("AGENT_TRACE_FILE")
+    if path and path not in _trace_files:
+        _trace_files[path] = JSONLExporter(path)
+        tracer.add_exporter(_trace_files[path])
+
+configure_from_env()
@@ -0,0 +1,11 @@
+from typing import TYPE_CHECKING
+from agent_common.lazy import lazy_exports
+
+__all__ = ["AgentServer", "create_app"]
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "AgentServer": "agent_server.app",
+    "create_app": "agent_server.app",
+})
+
+if TYPE_CHECKING:
+    from agent_server.app import AgentServer, create_app
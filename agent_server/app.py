@@ -0,0 +1,248 @@
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Tuple
+import asyncio
+import json
+from agent_common.tokens import token_ledger
+from agent_common.tracing import span
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+class HTTPError(Exception):
+    """An error that maps directly onto an HTTP response"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+class AgentServer:
+    """ASGI application serving the lead, sales engineer and sales agents
+
+    The agents, their DuckDB connections and their HTTP clients are created once,
+    at startup, and shared by every request, so a request costs only its LLM and
+    query time. At most `max_concurrency` requests run at once; up to `max_queue`
+    more wait for a slot and any beyond that are turned away with a 503.
+
+    Endpoints take a JSON body and return JSON, or stream plain text when the body
+    sets "stream": true:
+
+    - POST /leads/query      {"query": ..., "page": 1}
+    - POST /engineer/analyze {"requirements": ...}
+    - POST /proposals        {"lead_id": ...} or {"query": ...}
+    - GET  /health
+    """
+
+    def __init__(self, max_concurrency: int = 8, max_queue: int = 64):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.sales_agent = None
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._startup_lock = asyncio.Lock()
+        self.routes: Dict[Tuple[str, str], Handler] = {
+            ("GET", "/health"): self.health,
+            ("POST", "/leads/query"): self.query_leads,
+            ("POST", "/engineer/analyze"): self.analyze,
+            ("POST", "/proposals"): self.proposals,
+        }
+
+    async def startup(self):
+        """Build the agents, and with them the connections and HTTP clients"""
+        async with self._startup_lock:
+            if self.sales_agent is None:
+                from sales_agent.sales_agent import SalesAgent
+                self.sales_agent = await asyncio.to_thread(SalesAgent)
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive: Callable, send: Callable):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope: Dict[str, Any], receive: Callable, send: Callable):
+        path = scope["path"].rstrip("/") or "/"
+        handler = self.routes.get((scope["method"], path))
+        try:
+            if handler is None:
+                allowed = [method for method, route in self.routes if route == path]
+                raise HTTPError(405 if allowed else 404, "Method not allowed" if allowed else "Not found")
+            if path == "/health":
+                await send_json(send, 200, await handler({}))
+                return
+            body = await read_json(receive)
+            # Servers that skip the lifespan protocol start the agents on first use
+            await self.startup()
+            with span("http.request", method=scope["method"], path=path):
+                async with self._slot():
+                    result = await handler(body)
+                    if isinstance(result, dict):
+                        await send_json(send, 200, result)
+                    else:
+                        # Hold the slot until the stream is finished
+                        await send_stream(send, result)
+        except HTTPError as e:
+            await send_json(send, e.status, {"error": e.message})
+        except Exception as e:
+            await send_json(send, 500, {"error": f"An error occurred: {str(e)}"})
+
+    def _slot(self) -> "_Slot":
+        if self.waiting >= self.max_queue and self.in_flight >= self.max_concurrency:
+            raise HTTPError(503, "Server busy, try again later")
+        return _Slot(self)
+
+    async def health(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "status": "ok" if self.sales_agent is not None else "starting",
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "sql": self.sales_agent.lead_agent.sql_stats.snapshot() if self.sales_agent is not None else None,
+            "prompt_tokens": token_ledger.snapshot(),
+        }
+
+    async def query_leads(self, body: Dict[str, Any]) -> Any:
+        """Answer a natural language question about the leads"""
+        query = require(body, "query")
+        page = body.get("page", 1)
+        if not isinstance(page, int) or page < 1:
+            raise HTTPError(400, "page must be a positive integer")
+        lead_agent = self.sales_agent.lead_agent
+        if body.get("stream"):
+            return lead_agent.astream(query, page=page)
+        return {"response": await lead_agent.arun(query, page=page)}
+
+    async def analyze(self, body: Dict[str, Any]) -> Any:
+        """Produce a project plan and effort estimate for some requirements"""
+        requirements = require(body, "requirements")
+        engineer = self.sales_agent.sales_engineer
+        if body.get("stream"):
+            return engineer.astream(requirements)
+        project_plan, estimate = await engineer.aplan_and_estimate(requirements)
+        return {
+            "response": engineer.combine(project_plan, estimate),
+            "project_plan": project_plan,
+            "estimate": estimate.model_dump(),
+        }
+
+    async def proposals(self, body: Dict[str, Any]) -> Any:
+        """Write a proposal for a lead, given its ID or a free-text request"""
+        lead_id = body.get("lead_id")
+        query = body.get("query")
+        if lead_id is None and not query:
+            raise HTTPError(400, "Provide either lead_id or query")
+        if lead_id is None:
+            try:
+                lead_id = await self.sales_agent.aextract_lead_id(query)
+            except ValueError as e:
+                raise HTTPError(400, str(e))
+        # JSON booleans are ints in Python, and int() would accept floats and padded strings
+        if isinstance(lead_id, bool) or not (
+            isinstance(lead_id, int) or (isinstance(lead_id, str) and lead_id.isascii() and lead_id.isdigit())
+        ):
+            raise HTTPError(400, "lead_id must be an integer")
+        # Check the lead up front so a bad ID is a 404, not a failed stream
+        lead = await self.sales_agent.lead_agent.aget_lead(int(lead_id))
+        if lead is None:
+            raise HTTPError(404, f"Lead {lead_id} not found")
+        if body.get("stream"):
+            return self.sales_agent.astream(f"Generate a proposal for lead {lead.id}")
+        proposal = await self.sales_agent.agenerate_for_lead(str(lead.id))
+        return {"lead_id": str(lead.id), "proposal": proposal}
+
+class _Slot:
+    """Wait for, and then hold, one of the server's concurrency slots"""
+
+    def __init__(self, server: AgentServer):
+        self.server = server
+
+    async def __aenter__(self):
+        self.server.waiting += 1
+        try:
+            await self.server._semaphore.acquire()
+        finally:
+            self.server.waiting -= 1
+        self.server.in_flight += 1
+
+    async def __aexit__(self, *exc_info):
+        self.server.in_flight -= 1
+        self.server._semaphore.release()
+
+def require(body: Dict[str, Any], field: str) -> str:
+    """Return a required non-empty string field of a request body"""
+    value = body.get(field)
+    if not isinstance(value, str) or not value.strip():
+        raise HTTPError(400, f"Missing required field: {field}")
+    return value
+
+async def read_json(receive: Callable) -> Dict[str, Any]:
+    """Read the request body as a JSON object"""
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    raw = b"".join(chunks)
+    if not raw:
+        return {}
+    try:
+        body = json.loads(raw)
+    except json.JSONDecodeError as e:
+        raise HTTPError(400, f"Invalid JSON: {e}")
+    if not isinstance(body, dict):
+        raise HTTPError(400, "Request body must be a JSON object")
+    return body
+
+async def send_json(send: Callable, status: int, payload: Dict[str, Any]):
+    data = json.dumps(payload, default=str).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(data)).encode())],
+    })
+    await send({"type": "http.response.body", "body": data})
+
+async def send_stream(send: Callable, chunks: AsyncIterator[str]):
+    """Send text chunks as they are produced, using chunked transfer encoding"""
+    started = False
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            if not started:
+                await send({
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [(b"content-type", b"text/plain; charset=utf-8")],
+                })
+                started = True
+            await send({"type": "http.response.body", "body": chunk.encode(), "more_body": True})
+    except Exception as e:
+        if not started:
+            raise
+        # The status line is already sent, so report the failure in the body
+        await send({"type": "http.response.body", "body": f"\n\nAn error occurred: {str(e)}".encode(), "more_body": True})
+    if not started:
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain; charset=utf-8")]})
+    await send({"type": "http.response.body", "body": b""})
+
+def create_app(max_concurrency: int = 8, max_queue: int = 64) -> AgentServer:
+    """Create the ASGI application"""
+    return AgentServer(max_concurrency, max_queue)
+
+# For ASGI servers pointed at a module attribute, e.g. `uvicorn agent_server.app:app`
+app = create_app()
@@ -0,0 +1,40 @@
+import sys
+from pathlib import Path
+import typer
+from rich.console import Console
+# Make the agent packages importable when run as a script, e.g. `uv run agent_server/cli.py`
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from agent_server import create_app
+from agent_common.tracing import configure_from_env
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+console = Console()
+
+app = typer.Typer(help="Agent Server - Serve the lead, sales engineer and sales agents over HTTP")
+
+@app.callback()
+def main():
+    """Configure tracing for every command"""
+    # Set AGENT_TRACE_FILE to also export every request's spans as JSONL
+    configure_from_env()
+
+@app.command()
+def serve(
+    host: str = typer.Option("127.0.0.1", help="Interface to listen on"),
+    port: int = typer.Option(8000, help="Port to listen on"),
+    concurrency: int = typer.Option(8, "--concurrency", "-c", min=1, help="Maximum number of requests handled at once"),
+    queue: int = typer.Option(64, "--queue", min=0, help="Requests allowed to wait for a slot before returning 503"),
+):
+    """Start the HTTP server"""
+    try:
+        import uvicorn
+    except ImportError:
+        console.print("[red]Serving needs uvicorn; install it with `uv sync --extra server`[/red]")
+        raise typer.Exit(code=1)
+    uvicorn.run(create_app(concurrency, queue), host=host, port=port, lifespan="on")
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,252 @@
+from typing import Any, Dict, List, Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import hashlib
+import json
+import re
+import threading
+import time
+import typer
+
+app = typer.Typer(help="Local stand-in for an OpenAI-compatible endpoint")
+
+ESTIMATE = {
+    "phases": [
+        {"name": "Discovery and design", "staffing": [{"role": "Tech Lead", "days": 5}, {"role": "Project Manager", "days": 5}]},
+        {"name": "Build", "staffing": [{"role": "Senior Engineer", "days": 40}, {"role": "Junior Engineer", "days": 30}, {"role": "DevOps Engineer", "days": 10}]},
+        {"name": "Testing and rollout", "staffing": [{"role": "QA Engineer", "days": 15}, {"role": "Project Manager", "days": 5}]},
+    ],
+    "risks": ["Integration with legacy systems", "Changing requirements"],
+}
+
+WORDS = (
+    "the project will deliver a scalable solution with clear milestones for design build "
+    "testing and rollout while the team manages risk through weekly reviews"
+).split()
+
+class MockStats:
+    """Counters for the requests served since the last reset"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.prompt_tokens = 0
+            self.cached_tokens = 0
+            self.completion_tokens = 0
+
+    def record(self, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0):
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+            self.completion_tokens += completion_tokens
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "completion_tokens": self.completion_tokens,
+            }
+
+def count_tokens(text: str) -> int:
+    """Approximate a token count; whitespace-separated words are good enough here"""
+    return len(text.split())
+
+def canned_response(prompt: str, response_tokens: int) -> str:
+    """Pick a plausible response for one of the agents' prompts"""
+    if "SQL expert" in prompt:
+        query = prompt.split("Query:", 1)[-1].split("\n", 1)[0]
+        lead_id = re.search(r"\bid\s+(\d+)", query)
+        term = re.search(r"contain '([^']*)'", query)
+        if lead_id:
+            return f"SELECT * FROM sales_leads WHERE id = {lead_id.group(1)}"
+        if "misspelled" in query and "previous SQL query failed" not in prompt:
+            # Exercises the agent's SQL repair loop
+            return "SELECT id, compnay, needs FROM sales_leads ORDER BY id"
+        if term:
+            pattern = term.group(1).replace("'", "''")
+            return (
+                "SELECT id, customer_name, company, needs FROM sales_leads "
+                f"WHERE company ILIKE '%{pattern}%' OR needs ILIKE '%{pattern}%' ORDER BY id"
+            )
+        if re.search(r"how many|count|average|total", query, re.IGNORECASE) and "lead_summary_by_needs" in prompt:
+            return "SELECT needs, leads, avg_budget FROM lead_summary_by_needs ORDER BY needs"
+        if re.search(r"how many|count|average|total", query, re.IGNORECASE):
+            return "SELECT needs, COUNT(*) AS leads, AVG(budget) AS avg_budget FROM sales_leads GROUP BY needs ORDER BY needs"
+        return "SELECT id, customer_name, company, needs FROM sales_leads ORDER BY id"
+    if "person-days each role works" in prompt:
+        return json.dumps(ESTIMATE)
+    if "Extract the lead ID" in prompt:
+        numbers = re.findall(r"\d+", prompt)
+        return numbers[0] if numbers else "1"
+    return " ".join(WORDS[i % len(WORDS)] for i in range(response_tokens))
+
+class MockLLMServer:
+    """OpenAI-compatible chat completions and embeddings server with simulated latency
+
+    Every response waits `latency` seconds (time to first token), then emits
+    completion tokens at `tokens_per_second`. Streaming requests receive the tokens
+    as server-sent events at that rate. Like a server with prefix caching, it
+    reports the tokens of leading messages it has already seen as cached.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.2,
+        tokens_per_second: float = 200.0,
+        response_tokens: int = 200,
+    ):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.stats = MockStats()
+        self._prefixes: set = set()
+        self._prefixes_lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/stats"):
+                    self._send_json(server.stats.snapshot())
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path.endswith("/chat/completions"):
+                    server._chat(self, body)
+                elif self.path.endswith("/embeddings"):
+                    server._embeddings(self, body)
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+
+            def _send_json(self, payload: Any, status: int = 200):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockLLMServer":
+        """Serve requests on a background thread"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _cached_tokens(self, messages: List[Dict[str, Any]]) -> int:
+        """Tokens of the longest run of leading messages seen before, then remember these"""
+        digest = hashlib.sha256()
+        cached, hit = 0, True
+        with self._prefixes_lock:
+            for message in messages:
+                digest.update(json.dumps([message.get("role"), message.get("content")]).encode())
+                prefix = digest.hexdigest()
+                hit = hit and prefix in self._prefixes
+                if hit:
+                    cached += count_tokens(str(message.get("content", "")))
+                self._prefixes.add(prefix)
+        return cached
+
+    def _chat(self, handler: BaseHTTPRequestHandler, body: Dict[str, Any]):
+        messages = body.get("messages", [])
+        prompt = "\n".join(str(message.get("content", "")) for message in messages)
+        text = canned_response(prompt, self.response_tokens)
+        tokens = re.findall(r"\S+\s*", text)
+        prompt_tokens = count_tokens(prompt)
+        cached_tokens = self._cached_tokens(messages)
+        self.stats.record(prompt_tokens, len(tokens), cached_tokens)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(tokens),
+            "total_tokens": prompt_tokens + len(tokens),
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        }
+        model = body.get("model") or "mock"
+        created = int(time.time())
+        time.sleep(self.latency)
+
+        if not body.get("stream"):
+            time.sleep(len(tokens) / self.tokens_per_second)
+            handler._send_json({
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+
+        def send(choices: List[Dict[str, Any]], **extra):
+            chunk = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": created, "model": model, "choices": choices, **extra}
+            handler.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            handler.wfile.flush()
+
+        for token in tokens:
+            send([{"index": 0, "delta": {"content": token}, "finish_reason": None}])
+            time.sleep(1 / self.tokens_per_second)
+        send([{"index": 0, "delta": {}, "finish_reason": "stop"}], usage=usage)
+        handler.wfile.write(b"data: [DONE]\n\n")
+        handler.wfile.flush()
+        handler.close_connection = True
+
+    def _embeddings(self, handler: BaseHTTPRequestHandler, body: Dict[str, Any]):
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        data = []
+        for index, text in enumerate(inputs):
+            # Deterministic pseudo-embedding so identical text always matches
+            digest = hashlib.sha256(str(text).encode()).digest()
+            data.append({"object": "embedding", "index": index, "embedding": [b / 255 for b in digest]})
+        handler._send_json({"object": "list", "data": data, "model": body.get("model"), "usage": {"prompt_tokens": 0, "total_tokens": 0}})
+
+@app.command()
+def main(
+    host: str = typer.Option("127.0.0.1", help="Interface to listen on"),
+    port: int = typer.Option(8765, help="Port to listen on"),
+    latency: float = typer.Option(0.2, help="Seconds before the first token of every response"),
+    tokens_per_second: float = typer.Option(200.0, help="Completion token rate"),
+    response_tokens: int = typer.Option(200, help="Length of canned prose responses, in tokens"),
+):
+    """Run the mock server in the foreground"""
+    server = MockLLMServer(host, port, latency, tokens_per_second, response_tokens)
+    print(f"Mock LLM server listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,329 @@
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timezone
+from pathlib import Path
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import typer
+from rich.console import Console
+from rich.table import Table
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+from benchmarks.mock_llm_server import MockLLMServer
+from agent_common.tracing import Span, tracer
+
+RESULTS_PATH = Path(__file__).resolve().parent / "results.jsonl"
+
+console = Console()
+app = typer.Typer(help="Benchmark the agents and CLIs against a local mock LLM")
+
+CLI_SCENARIOS = {
+    "cli.lead.query": ["lead_agent/cli.py", "query", "List all leads"],
+    "cli.engineer.analyze": ["sales_engineer_agent/cli.py", "analyze", "Build a CRM for a sales team"],
+    "cli.sales.list-leads": ["sales_agent/cli.py", "list-leads"],
+    "cli.sales.search": ["sales_agent/cli.py", "search", "cloud"],
+    "cli.sales.generate": ["sales_agent/cli.py", "generate", "7"],
+}
+
+class DuckDBTimer:
+    """Accumulate the wall time of the duckdb.query spans recorded by the agents, in total and per stage
+
+    A query's stage is the span it ran under, e.g. lead.execute_sql. Spans are
+    exported as they end, children before their parents, so stages are looked up
+    once the scenario has finished.
+    """
+
+    NAMES = ("duckdb.query",)
+
+    def __init__(self):
+        self.reset()
+        tracer.add_exporter(self)
+
+    def reset(self):
+        self.seconds = 0.0
+        self.queries: List[Span] = []
+        self.stage_names: Dict[str, str] = {}
+
+    def __call__(self, span: Span):
+        if span.name in self.NAMES:
+            self.seconds += span.duration_ms / 1000
+            self.queries.append(span)
+        else:
+            self.stage_names[span.span_id] = span.name
+
+    def by_stage(self) -> Dict[str, float]:
+        """Seconds of DuckDB time under each stage"""
+        stages: Dict[str, float] = {}
+        for query in self.queries:
+            stage = self.stage_names.get(query.parent_id, "(no stage)")
+            stages[stage] = stages.get(stage, 0.0) + query.duration_ms / 1000
+        return stages
+
+def agent_scenarios(use_sql_cache: bool, use_estimate_cache: bool) -> Dict[str, Any]:
+    """Build the agents once and return the calls to benchmark, plus their DuckDB timer"""
+    from lead_agent.lead_agent import LeadAgent
+    from sales_agent.sales_agent import SalesAgent, run_async
+    from sales_engineer_agent.sales_engineer_agent import SalesEngineerAgent
+
+    lead = LeadAgent(use_sql_cache=use_sql_cache)
+    engineer = SalesEngineerAgent(use_cache=use_estimate_cache)
+    sales = SalesAgent()
+    sales.lead_agent = lead
+    sales.sales_engineer = engineer
+    timer = DuckDBTimer()
+
+    scenarios = {
+        "lead.list": lambda: lead.run("List all leads showing their IDs, company names, and needs."),
+        "lead.aggregate": lambda: lead.run("How many leads do we have for each need?"),
+        "lead.repair": lambda: lead.run("List the leads, with a misspelled column"),
+        "engineer.run": lambda: engineer.run("We need to migrate our on-premise CRM to the cloud"),
+        "sales.run": lambda: sales.run("Generate a proposal for lead 7"),
+        "sales.arun": lambda: run_async(sales.arun("Generate a proposal for lead 7")),
+        "sales.list_leads": lambda: sales.list_leads(),
+        "sales.search_leads": lambda: sales.search_leads("cloud"),
+    }
+    return {"scenarios": scenarios, "timer": timer}
+
+def summarize(
+    latencies: List[float],
+    llm: Dict[str, int],
+    iterations: int,
+    duckdb_seconds: Optional[float],
+    duckdb_stages: Optional[Dict[str, float]] = None,
+) -> Dict[str, Any]:
+    """Reduce raw measurements to per-iteration statistics"""
+    return {
+        "iterations": iterations,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "llm_calls": llm["calls"] / iterations,
+        "tokens_in": llm["prompt_tokens"] / iterations,
+        "tokens_cached": llm["cached_tokens"] / iterations,
+        "tokens_out": llm["completion_tokens"] / iterations,
+        "duckdb_ms": duckdb_seconds * 1000 / iterations if duckdb_seconds is not None else None,
+        "duckdb_ms_by_stage": {stage: seconds * 1000 / iterations for stage, seconds in (duckdb_stages or {}).items()},
+    }
+
+def git_revision() -> Dict[str, Any]:
+    """Identify the commit the benchmark ran against"""
+    def git(*args: str) -> str:
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    return {"commit": git("rev-parse", "--short", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+def print_results(results: Dict[str, Dict[str, Any]]):
+    table = Table(title="Benchmark results (per iteration)")
+    for column in ("scenario", "p50 ms", "p95 ms", "LLM calls", "tokens in", "tokens cached", "tokens out", "DuckDB ms"):
+        table.add_column(column, justify="left" if column == "scenario" else "right")
+    for name, stats in results.items():
+        duckdb_ms = f"{stats['duckdb_ms']:.1f}" if stats["duckdb_ms"] is not None else "-"
+        table.add_row(
+            name,
+            f"{stats['p50_ms']:.0f}",
+            f"{stats['p95_ms']:.0f}",
+            f"{stats['llm_calls']:.1f}",
+            f"{stats['tokens_in']:.0f}",
+            f"{stats.get('tokens_cached', 0):.0f}",
+            f"{stats['tokens_out']:.0f}",
+            duckdb_ms,
+        )
+    console.print(table)
+
+    stages = Table(title="DuckDB time by stage (per iteration)")
+    for column in ("scenario", "stage", "DuckDB ms"):
+        stages.add_column(column, justify="right" if column.endswith("ms") else "left")
+    for name, stats in results.items():
+        for stage, ms in sorted(stats.get("duckdb_ms_by_stage", {}).items(), key=lambda item: -item[1]):
+            stages.add_row(name, stage, f"{ms:.1f}")
+    if stages.row_count:
+        console.print(stages)
+
+@app.command()
+def run(
+    iterations: int = typer.Option(5, "--iterations", "-n", min=1, help="Runs per scenario"),
+    latency: float = typer.Option(0.2, help="Mock LLM time to first token, in seconds"),
+    tokens_per_second: float = typer.Option(200.0, help="Mock LLM completion token rate"),
+    response_tokens: int = typer.Option(200, help="Length of the mock LLM's prose responses"),
+    db_path: str = typer.Option("lead_agent/leads.db", "--db-path", help="Lead database to benchmark against"),
+    sql_cache: bool = typer.Option(False, "--sql-cache/--no-sql-cache", help="Let LeadAgent use its NL->SQL cache"),
+    estimate_cache: bool = typer.Option(False, "--estimate-cache/--no-estimate-cache", help="Let SalesEngineerAgent use its estimate cache"),
+    cli: bool = typer.Option(True, "--cli/--no-cli", help="Also benchmark the CLI commands, including process start-up"),
+    only: Optional[str] = typer.Option(None, help="Only run scenarios whose name contains this text"),
+    save: bool = typer.Option(True, "--save/--no-save", help=f"Append the results to {RESULTS_PATH.name}"),
+):
+    """Run every scenario against a mock LLM and report latency, LLM usage and DuckDB time"""
+    server = MockLLMServer(latency=latency, tokens_per_second=tokens_per_second, response_tokens=response_tokens).start()
+    cache_dir = tempfile.mkdtemp(prefix="lead-bench-")
+    env = {
+        "OPENAI_BASE_URL": server.base_url,
+        "OPENAI_API_KEY": "mock",
+        "OPENAI_MODEL": "mock",
+        "LEADS_DB_PATH": db_path,
+        "LEAD_SQL_CACHE_PATH": os.path.join(cache_dir, "sql_cache.db"),
+        "ESTIMATE_CACHE_PATH": os.path.join(cache_dir, "estimate_cache.db"),
+        "PROPOSAL_CHECKPOINT_PATH": os.path.join(cache_dir, "checkpoints.db"),
+    }
+    os.environ.update(env)
+    os.chdir(ROOT)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        agents = agent_scenarios(sql_cache, estimate_cache)
+        timer = agents["timer"]
+        for name, call in agents["scenarios"].items():
+            if only and only not in name:
+                continue
+            console.print(f"[cyan]{name}[/cyan]")
+            call()  # warm-up
+            server.stats.reset()
+            timer.reset()
+            latencies = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                call()
+                latencies.append(time.perf_counter() - start)
+            results[name] = summarize(latencies, server.stats.snapshot(), iterations, timer.seconds, timer.by_stage())
+
+        if cli:
+            for name, args in CLI_SCENARIOS.items():
+                if only and only not in name:
+                    continue
+                console.print(f"[cyan]{name}[/cyan]")
+                server.stats.reset()
+                latencies = []
+                for _ in range(iterations):
+                    start = time.perf_counter()
+                    completed = subprocess.run([sys.executable, *args], cwd=ROOT, env={**os.environ, **env}, capture_output=True, text=True)
+                    latencies.append(time.perf_counter() - start)
+                    if completed.returncode != 0:
+                        raise RuntimeError(f"{name} failed:\n{completed.stdout}\n{completed.stderr}")
+                results[name] = summarize(latencies, server.stats.snapshot(), iterations, None)
+    finally:
+        server.stop()
+
+    print_results(results)
+    if save:
+        record = {
+            **git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "config": {
+                "iterations": iterations,
+                "latency": latency,
+                "tokens_per_second": tokens_per_second,
+                "response_tokens": response_tokens,
+                "db_path": db_path,
+                "sql_cache": sql_cache,
+                "estimate_cache": estimate_cache,
+            },
+            "results": results,
+        }
+        with open(RESULTS_PATH, "a") as f:
+            f.write(json.dumps(record) + "\n")
+        console.print(f"[green]Saved results for {record['commit']} to {RESULTS_PATH}[/green]")
+
+STARTUP_SCENARIOS = {
+    "lead --help": ["lead_agent/cli.py", "--help"],
+    "lead query --help": ["lead_agent/cli.py", "query", "--help"],
+    "engineer --help": ["sales_engineer_agent/cli.py", "--help"],
+    "engineer analyze --help": ["sales_engineer_agent/cli.py", "analyze", "--help"],
+    "sales --help": ["sales_agent/cli.py", "--help"],
+    "sales generate --help": ["sales_agent/cli.py", "generate", "--help"],
+    "sales list-leads": ["sales_agent/cli.py", "list-leads"],
+    "server --help": ["agent_server/cli.py", "--help"],
+}
+
+def heaviest_imports(importtime: str, top: int) -> List[str]:
+    """Parse `python -X importtime` output into the top-level imports that took longest"""
+    modules = []
+    for line in importtime.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Only the imports made directly by the program, not their dependencies
+        if name.startswith(" ") and not name.startswith("  "):
+            modules.append((int(cumulative), name.strip()))
+    return [f"{name} {us / 1000:.0f}ms" for us, name in sorted(modules, reverse=True)[:top]]
+
+@app.command()
+def startup(
+    iterations: int = typer.Option(5, "--iterations", "-n", min=1, help="Runs per command"),
+    budget_ms: float = typer.Option(300.0, help="Fail if any command's median wall time exceeds this"),
+    top: int = typer.Option(3, help="How many of the heaviest imports to list per command"),
+):
+    """Measure CLI cold start-up, and the imports it spends its time on"""
+    env = {**os.environ, "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "unused")}
+    table = Table(title="CLI start-up")
+    for column in ("command", "min ms", "median ms", "heaviest imports"):
+        table.add_column(column, justify="right" if column.endswith("ms") else "left")
+
+    over_budget = []
+    for name, args in STARTUP_SCENARIOS.items():
+        latencies, importtime = [], ""
+        for _ in range(iterations):
+            start = time.perf_counter()
+            completed = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=ROOT, env=env, capture_output=True, text=True)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if completed.returncode != 0:
+                raise RuntimeError(f"{name} failed:\n{completed.stdout}\n{completed.stderr}")
+            importtime = completed.stderr
+        median = float(np.median(latencies))
+        if median > budget_ms:
+            over_budget.append(name)
+        style = "red" if median > budget_ms else "green"
+        table.add_row(name, f"{min(latencies):.0f}", f"[{style}]{median:.0f}[/{style}]", ", ".join(heaviest_imports(importtime, top)))
+    console.print(table)
+    if over_budget:
+        console.print(f"[red]Over the {budget_ms:.0f}ms budget: {', '.join(over_budget)}[/red]")
+        raise typer.Exit(code=1)
+
+@app.command()
+def compare(
+    baseline: Optional[str] = typer.Option(None, help="Commit to compare against; defaults to the previous run"),
+    threshold: float = typer.Option(10.0, help="Fail if any p50 regresses by more than this many percent"),
+):
+    """Compare the latest saved run with an earlier one"""
+    if not RESULTS_PATH.exists():
+        console.print(f"[red]No results in {RESULTS_PATH}; run the benchmarks first[/red]")
+        raise typer.Exit(code=1)
+    runs = [json.loads(line) for line in RESULTS_PATH.read_text().splitlines() if line.strip()]
+    current = runs[-1]
+    earlier = [r for r in runs[:-1] if baseline is None or r["commit"].startswith(baseline)]
+    if not earlier:
+        console.print("[red]No baseline run to compare against[/red]")
+        raise typer.Exit(code=1)
+    base = earlier[-1]
+    if base["config"] != current["config"]:
+        console.print("[yellow]Warning: the two runs used different configurations[/yellow]")
+
+    table = Table(title=f"{base['commit']} -> {current['commit']}")
+    for column in ("scenario", "p50 ms", "change", "p95 ms", "LLM calls", "tokens in"):
+        table.add_column(column, justify="left" if column == "scenario" else "right")
+    regressions = []
+    for name, stats in current["results"].items():
+        before = base["results"].get(name)
+        if before is None:
+            table.add_row(name, f"{stats['p50_ms']:.0f}", "new", f"{stats['p95_ms']:.0f}", f"{stats['llm_calls']:.1f}", f"{stats['tokens_in']:.0f}")
+            continue
+        change = (stats["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100
+        if change > threshold:
+            regressions.append(name)
+        style = "red" if change > threshold else "green" if change < -threshold else ""
+        table.add_row(
+            name,
+            f"{before['p50_ms']:.0f} -> {stats['p50_ms']:.0f}",
+            f"[{style}]{change:+.1f}%[/{style}]" if style else f"{change:+.1f}%",
+            f"{before['p95_ms']:.0f} -> {stats['p95_ms']:.0f}",
+            f"{before['llm_calls']:.1f} -> {stats['llm_calls']:.1f}",
+            f"{before['tokens_in']:.0f} -> {stats['tokens_in']:.0f}",
+        )
+    console.print(table)
+    if regressions:
+        console.print(f"[red]p50 regressed by more than {threshold:.0f}% in: {', '.join(regressions)}[/red]")
+        raise typer.Exit(code=1)
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,12 @@
+from typing import TYPE_CHECKING
+from agent_common.lazy import lazy_exports
+
+__all__ = ["Lead", "LeadAgent", "create_graph"]
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "Lead": "lead_agent.lead_agent",
+    "LeadAgent": "lead_agent.lead_agent",
+    "create_graph": "lead_agent.lead_agent",
+})
+
+if TYPE_CHECKING:
+    from lead_agent.lead_agent import Lead, LeadAgent, create_graph
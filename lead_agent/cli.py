@@ -1,11 +1,21 @@
+from typing import List, Optional
+import os
+import sys
+from pathlib import Path
 import typer
 from rich.console import Console
 from rich.panel import Panel
 from rich.markdown import Markdown
 from rich.prompt import Prompt
 from rich.theme import Theme
-from lead_agent import create_graph
-from langchain_core.messages import HumanMessage
+from rich.live import Live
+from rich.spinner import Spinner
+# Make the agent packages importable when run as a script, e.g. `uv run lead_agent/cli.py`
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# The package loads its agent, and with it langchain, on first attribute access
+import lead_agent
+from agent_common.profiling import profiled
+from agent_common.tracing import configure_from_env
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -21,6 +31,17 @@ console = Console(theme=Theme({
 
 app = typer.Typer(help="Lead Agent CLI - Query your sales leads database")
 
+@app.callback()
+def main(
+    ctx: typer.Context,
+    profile: bool = typer.Option(False, "--profile", help="Print a per-stage timing breakdown after the command"),
+):
+    """Configure tracing for every command"""
+    # Set AGENT_TRACE_FILE to also export every span as JSONL
+    configure_from_env()
+    if profile:
+        ctx.with_resource(profiled(console, f"lead_agent.{ctx.invoked_subcommand}"))
+
 def display_welcome():
     welcome_md = """
     # 🎯 Lead Agent CLI
@@ -33,11 +54,23 @@ def display_welcome():
     """
     console.print(Panel(Markdown(welcome_md), title="Welcome", border_style="blue"))
 
+def stream_response(workflow, query: str, status: str, title: str, page: int = 1) -> str:
+    """Render the response live as tokens stream from the workflow"""
+    from langchain_core.messages import HumanMessage
+    response = ""
+    state = {"messages": [HumanMessage(content=query)], "page": page}
+    with Live(Spinner("dots", text=status), console=console, refresh_per_second=12) as live:
+        for chunk in workflow.stream(state, stream_mode="custom"):
+            response += chunk
+            live.update(Panel(response, title=title, border_style="green"))
+        live.update(Panel(response, title=title, border_style="green"))
+    return response
+
 @app.command()
 def interactive():
     """Start an interactive session with the Lead Agent"""
     display_welcome()
-    workflow = create_graph()
+    workflow = lead_agent.create_graph()
     
     while True:
         try:
@@ -47,33 +80,65 @@ def interactive():
                 console.print("\n[info]Goodbye! 👋[/info]")
                 break
                 
-            with console.status("[bold blue]Processing query...[/bold blue]"):
-                state = {"messages": [HumanMessage(content=query)]}
-                final_state = workflow.invoke(state)
-                response = final_state["messages"][-1].content
-            
-            console.print(Panel(response, title="Response", border_style="green"))
+            stream_response(workflow, query, "[bold blue]Processing query...[/bold blue]", "Response")
             
         except Exception as e:
             console.print(f"[error]Error: {str(e)}[/error]")
             console.print("[warning]Please try again with a different query.[/warning]")
 
 @app.command()
-def query(question: str):
+def query(
+    question: str,
+    page: int = typer.Option(1, "--page", min=1, help="Page of results to show for lead listings"),
+):
     """Run a single query and exit"""
-    workflow = create_graph()
+    workflow = lead_agent.create_graph()
     
     try:
-        with console.status("[bold blue]Processing query...[/bold blue]"):
-            state = {"messages": [HumanMessage(content=question)]}
-            final_state = workflow.invoke(state)
-            response = final_state["messages"][-1].content
-        
-        console.print(Panel(response, title="Response", border_style="green"))
+        stream_response(workflow, question, "[bold blue]Processing query...[/bold blue]", "Response", page)
         
     except Exception as e:
         console.print(f"[error]Error: {str(e)}[/error]")
         raise typer.Exit(code=1)
 
+@app.command()
+def ingest(
+    paths: List[str] = typer.Argument(..., help="CSV, JSONL, Parquet or Arrow IPC files or globs to append"),
+    format: Optional[str] = typer.Option(None, "--format", help="File format, if the extension does not tell: csv, json, parquet or arrow"),
+    db_path: str = typer.Option(None, "--db-path", help="DuckDB database to append to, defaults to LEADS_DB_PATH"),
+    deduplicate: bool = typer.Option(True, "--deduplicate/--keep-duplicates", help="Skip leads whose customer name and company are already known"),
+):
+    """Append leads from files, then update the search index and summaries"""
+    from lead_agent.connection import get_cursor
+    from lead_agent.ingest import LeadIngestor
+    db_path = db_path or os.getenv("LEADS_DB_PATH", "lead_agent/leads.db")
+    try:
+        ingestor = LeadIngestor(lambda: get_cursor(db_path, read_only=False))
+        result = ingestor.ingest(paths, format, deduplicate)
+    except Exception as e:
+        console.print(f"[error]Error: {str(e)}[/error]")
+        raise typer.Exit(code=1)
+    console.print(
+        f"[success]Added {result.inserted} of {result.received} leads ({result.duplicates} duplicates) "
+        f"in {result.seconds:.1f}s; changes {result.first_seq}-{result.last_seq}[/success]"
+    )
+
+@app.command()
+def index(
+    db_path: str = typer.Option(None, "--db-path", help="DuckDB database to index, defaults to LEADS_DB_PATH"),
+):
+    """Build the full-text search index, or add the leads inserted since it was last updated"""
+    import time
+    from lead_agent.connection import get_cursor
+    from lead_agent.search import LeadSearchIndex
+    db_path = db_path or os.getenv("LEADS_DB_PATH", "lead_agent/leads.db")
+    start = time.perf_counter()
+    try:
+        added = LeadSearchIndex(lambda: get_cursor(db_path, read_only=False), install=True).update()
+    except Exception as e:
+        console.print(f"[error]Error: {str(e)}[/error]")
+        raise typer.Exit(code=1)
+    console.print(f"[success]Indexed {added} leads in {time.perf_counter() - start:.1f}s[/success]")
+
 if __name__ == "__main__":
     app() 
\ No newline at end of file
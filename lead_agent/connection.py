@@ -0,0 +1,80 @@
+from typing import Callable, Dict, Optional, Tuple
+import os
+import threading
+import duckdb
+
+# One connection per (database file, mode) for the whole process
+_connections: Dict[Tuple[str, bool], duckdb.DuckDBPyConnection] = {}
+_cursor_setup: Dict[Tuple[str, bool], Callable[[duckdb.DuckDBPyConnection], None]] = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+def _key(db_path: str, read_only: bool) -> Tuple[str, bool]:
+    # Names starting with :memory: identify in-memory databases, not files
+    if db_path.startswith(":memory:"):
+        return (db_path, read_only)
+    return (os.path.abspath(db_path), read_only)
+
+def get_connection(
+    db_path: str,
+    read_only: bool = True,
+    connect: Optional[Callable[[], duckdb.DuckDBPyConnection]] = None,
+    setup_cursor: Optional[Callable[[duckdb.DuckDBPyConnection], None]] = None,
+) -> duckdb.DuckDBPyConnection:
+    """Return the process-wide connection to a database file, opening it on first use
+
+    Read-only connections take a shared file lock, so any number of processes can
+    read the same database at once. `connect` opens the connection instead, e.g.
+    an in-memory database over external files, and `setup_cursor` prepares each
+    cursor on it, for state such as registered Arrow objects that cursors do not
+    share.
+    """
+    key = _key(db_path, read_only)
+    with _lock:
+        conn = _connections.get(key)
+        if conn is None:
+            conn = connect() if connect else duckdb.connect(db_path, read_only=read_only)
+            _connections[key] = conn
+            if setup_cursor:
+                _cursor_setup[key] = setup_cursor
+    return conn
+
+def get_cursor(db_path: str, read_only: bool = True) -> duckdb.DuckDBPyConnection:
+    """Return the calling thread's cursor on the shared connection
+
+    DuckDB connections must not be used from several threads at once, but cursors
+    on the same connection can, and they share its catalog and buffer pool.
+    """
+    cursors = getattr(_local, "cursors", None)
+    if cursors is None:
+        cursors = _local.cursors = {}
+    key = _key(db_path, read_only)
+    conn = get_connection(db_path, read_only)
+    owner, cursor = cursors.get(key, (None, None))
+    # Reopen the cursor if the shared connection was closed and replaced
+    if owner is not conn:
+        cursor = conn.cursor()
+        if key in _cursor_setup:
+            _cursor_setup[key](cursor)
+        cursors[key] = (conn, cursor)
+    return cursor
+
+def open_cursor(db_path: str, read_only: bool = True) -> duckdb.DuckDBPyConnection:
+    """Open a new cursor on the shared connection, for the caller to close
+
+    Running a query on a cursor ends any result still streaming from it, so a
+    result that outlives the call that started it needs a cursor of its own.
+    """
+    key = _key(db_path, read_only)
+    cursor = get_connection(db_path, read_only).cursor()
+    if key in _cursor_setup:
+        _cursor_setup[key](cursor)
+    return cursor
+
+def close_all():
+    """Close every shared connection, e.g. before writing to a database file"""
+    with _lock:
+        for conn in _connections.values():
+            conn.close()
+        _connections.clear()
+        _cursor_setup.clear()
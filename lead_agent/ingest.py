@@ -0,0 +1,190 @@
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence, Tuple, Union
+from datetime import datetime
+import threading
+import time
+import duckdb
+from agent_common.tracing import span
+from lead_agent.search import LeadSearchIndex
+from lead_agent.sources import LeadSource
+from lead_agent.summaries import LeadSummaries
+
+# Columns an ingested lead may have, and their types in sales_leads; the ID
+# always comes from the table's sequence
+LEAD_COLUMNS = {
+    "customer_name": "VARCHAR",
+    "company": "VARCHAR",
+    "needs": "VARCHAR",
+    "budget": "DECIMAL",
+    "timeline_start": "DATE",
+    "timeline_end": "DATE",
+    "created_at": "TIMESTAMP",
+}
+
+def create_schema(cursor: duckdb.DuckDBPyConnection):
+    """Create the sales_leads table, the change log and their sequences if they do not exist
+
+    Leads already in the table when the change log is created are recorded in it
+    as inserted, so the log covers every lead.
+    """
+    cursor.execute("CREATE SEQUENCE IF NOT EXISTS sales_leads_id_seq")
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS sales_leads (
+            id INTEGER PRIMARY KEY DEFAULT(nextval('sales_leads_id_seq')),
+            {", ".join(f"{column} {column_type}" for column, column_type in LEAD_COLUMNS.items())}
+        )
+    """)
+    logged = cursor.execute(
+        "SELECT count(*) FROM duckdb_tables() WHERE database_name = current_database() AND table_name = 'lead_changes'"
+    ).fetchone()[0]
+    if logged:
+        return
+    cursor.execute("CREATE SEQUENCE IF NOT EXISTS lead_changes_seq")
+    # The sequence keeps seq unique; a primary key index would only slow appends
+    cursor.execute("""
+        CREATE TABLE lead_changes (
+            seq BIGINT DEFAULT(nextval('lead_changes_seq')),
+            lead_id BIGINT,
+            change VARCHAR,
+            changed_at TIMESTAMP DEFAULT(current_timestamp)
+        )
+    """)
+    cursor.execute("INSERT INTO lead_changes (lead_id, change) SELECT id, 'insert' FROM sales_leads ORDER BY id")
+
+class IngestResult(NamedTuple):
+    """What one ingest call did"""
+    received: int
+    inserted: int
+    duplicates: int
+    # Change log sequence numbers of the inserted leads, or 0 if none were inserted
+    first_seq: int
+    last_seq: int
+    seconds: float
+
+class LeadIngestor:
+    """Appends batches of leads, skipping duplicates, and logs every change
+
+    A batch is one or more CSV, JSONL, Parquet or Arrow IPC files (globs, local or
+    remote), or a pandas DataFrame or pyarrow Table or RecordBatchReader. It is
+    loaded with one bulk INSERT ... SELECT: columns are matched by name, missing
+    ones are NULL (created_at defaults to now), and IDs come from the table's
+    sequence. A lead whose (customer_name, company) is already in the table, or
+    earlier in the batch, is skipped.
+
+    Each inserted lead gets a row in lead_changes in the same transaction, with a
+    sequence number that only ever increases, so consumers can follow the feed
+    with `changes(after=<last seq seen>)`. Afterwards the search index and summary
+    tables add just the new leads. Batches are ingested one at a time, keeping
+    lead IDs in commit order, which those incremental updates rely on.
+    """
+    _lock = threading.Lock()
+
+    def __init__(self, cursor: Callable[[], duckdb.DuckDBPyConnection], update_indexes: bool = True):
+        self.cursor = cursor
+        self.update_indexes = update_indexes
+        # Building the index is requested here, so FTS may be downloaded for stemming
+        self.search_index = LeadSearchIndex(cursor, install=True)
+        self.summaries = LeadSummaries(cursor)
+        create_schema(cursor())
+
+    def _scan(self, cursor: duckdb.DuckDBPyConnection, batch: Any, format: Optional[str]) -> str:
+        """A relation reading the batch: a table function for files, a registered view otherwise"""
+        if isinstance(batch, (str, list, tuple)):
+            source = LeadSource(batch, format)
+            if source.arrow is None:
+                return source.scan_sql(cursor)
+            batch = source.arrow
+        cursor.register("lead_ingest_batch", batch)
+        return "lead_ingest_batch"
+
+    def _select(self, cursor: duckdb.DuckDBPyConnection, scan: str) -> str:
+        """Select the batch's lead columns, cast to the table's types, in batch order"""
+        available = {row[0].lower() for row in cursor.execute(f"DESCRIBE SELECT * FROM {scan}").fetchall()}
+        if not available & set(LEAD_COLUMNS):
+            raise ValueError(f"The batch has none of the lead columns: {', '.join(LEAD_COLUMNS)}")
+        columns = []
+        for column, column_type in LEAD_COLUMNS.items():
+            if column in available:
+                columns.append(f'CAST("{column}" AS {column_type}) AS {column}')
+            elif column == "created_at":
+                columns.append("current_timestamp::TIMESTAMP AS created_at")
+            else:
+                columns.append(f"NULL::{column_type} AS {column}")
+        return f"SELECT {', '.join(columns)}, row_number() OVER () AS ordinal FROM {scan}"
+
+    def ingest(
+        self,
+        batch: Union[str, Sequence[str], Any],
+        format: Optional[str] = None,
+        deduplicate: bool = True,
+    ) -> IngestResult:
+        """Append a batch of leads; see the class docstring for what a batch can be"""
+        start = time.perf_counter()
+        with self._lock, span("lead_ingest.ingest") as s:
+            cursor = self.cursor()
+            scan = self._scan(cursor, batch, format)
+            columns = ", ".join(LEAD_COLUMNS)
+            cursor.execute("BEGIN TRANSACTION")
+            try:
+                cursor.execute(f"CREATE OR REPLACE TEMP TABLE lead_ingest_rows AS {self._select(cursor, scan)}")
+                received = cursor.execute("SELECT count(*) FROM lead_ingest_rows").fetchone()[0]
+                last_id = cursor.execute("SELECT coalesce(max(id), 0) FROM sales_leads").fetchone()[0]
+                new = "lead_ingest_rows"
+                if deduplicate:
+                    # Hash anti-join against the existing leads, then keep each pair's first row
+                    new = """(
+                        SELECT * FROM lead_ingest_rows AS new
+                        WHERE NOT EXISTS (
+                            SELECT 1 FROM sales_leads AS l
+                            WHERE l.customer_name IS NOT DISTINCT FROM new.customer_name
+                            AND l.company IS NOT DISTINCT FROM new.company
+                        )
+                        QUALIFY row_number() OVER (PARTITION BY customer_name, company ORDER BY ordinal) = 1
+                    )"""
+                cursor.execute(f"INSERT INTO sales_leads ({columns}) SELECT {columns} FROM {new} ORDER BY ordinal")
+                cursor.execute(
+                    f"INSERT INTO lead_changes (lead_id, change) SELECT id, 'insert' FROM sales_leads WHERE id > {int(last_id)} ORDER BY id"
+                )
+                inserted, first_seq, last_seq = cursor.execute(
+                    f"SELECT count(*), coalesce(min(seq), 0), coalesce(max(seq), 0) FROM lead_changes "
+                    f"WHERE change = 'insert' AND lead_id > {int(last_id)}"
+                ).fetchone()
+                cursor.execute("DROP TABLE lead_ingest_rows")
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            finally:
+                if scan == "lead_ingest_batch":
+                    cursor.unregister("lead_ingest_batch")
+            s.set(received=received, inserted=inserted)
+        if self.update_indexes and inserted:
+            self.search_index.update()
+            self.summaries.update()
+        return IngestResult(received, inserted, received - inserted, first_seq, last_seq, time.perf_counter() - start)
+
+    def reset(self):
+        """Record that every lead was removed, e.g. before the leads are regenerated
+
+        The log's earlier entries are dropped, but its sequence carries on, so the
+        feed stays monotonic; consumers that read a 'reset' change start over.
+        """
+        with self._lock:
+            cursor = self.cursor()
+            cursor.execute("BEGIN TRANSACTION")
+            try:
+                cursor.execute("DELETE FROM lead_changes")
+                cursor.execute("INSERT INTO lead_changes (lead_id, change) VALUES (NULL, 'reset')")
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+
+    def last_seq(self) -> int:
+        """Sequence number of the latest change, or 0 if there is none"""
+        return self.cursor().execute("SELECT coalesce(max(seq), 0) FROM lead_changes").fetchone()[0]
+
+    def changes(self, after: int = 0, limit: int = 10_000) -> List[Tuple[int, Optional[int], str, datetime]]:
+        """(seq, lead_id, change, changed_at) of up to `limit` changes after sequence number `after`"""
+        return self.cursor().execute(
+            f"SELECT seq, lead_id, change, changed_at FROM lead_changes WHERE seq > {int(after)} ORDER BY seq LIMIT {int(limit)}"
+        ).fetchall()
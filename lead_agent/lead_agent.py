@@ -1,113 +1,574 @@
-from typing import Dict, Any
-from langgraph.graph import Graph
-import duckdb
-import pandas as pd
+from __future__ import annotations
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Iterator, AsyncIterator, Sequence, Tuple, Union
+from datetime import date, datetime
+from decimal import Decimal
+from functools import cached_property
+import asyncio
 import os
-from langchain_core.messages import HumanMessage, AIMessage
-from langchain_openai import ChatOpenAI
+import threading
+import duckdb
+from pydantic import BaseModel
+from agent_common.prompts import get_prompt, prompt_version
+from agent_common.routing import model_for
+from agent_common.tokens import token_ledger
+from agent_common.tracing import span, traced
+from lead_agent.connection import get_connection, get_cursor, open_cursor
+from lead_agent.results import QueryResult, to_text
+from lead_agent.search import LeadSearchIndex, scan_leads
+from lead_agent.sources import LeadSource, created_at_partitions
+from lead_agent.summaries import LeadSummaries
+from lead_agent.sql_guard import SQLGuard, UnsafeQueryError
+from lead_agent.sql_cache import SQLCache
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from langchain_core.runnables import Runnable
+    from langgraph.graph import Graph
+
+class Lead(BaseModel):
+    """A single row of the sales_leads table"""
+    id: int
+    customer_name: Optional[str] = None
+    company: Optional[str] = None
+    needs: Optional[str] = None
+    budget: Optional[Decimal] = None
+    timeline_start: Optional[date] = None
+    timeline_end: Optional[date] = None
+    created_at: Optional[datetime] = None
+
+    def to_markdown(self) -> str:
+        """Render the lead as a short markdown summary"""
+        budget = f"${self.budget:,.2f}" if self.budget is not None else "n/a"
+        created = f"{self.created_at:%Y-%m-%d}" if self.created_at is not None else "n/a"
+        return f"""**Lead #{self.id}: {self.company}**
+- Contact: {self.customer_name}
+- Needs: {self.needs}
+- Budget: {budget}
+- Timeline: {self.timeline_start} to {self.timeline_end}
+- Created: {created}"""
+
+    def to_brief(self) -> str:
+        """The fields a proposal needs, one per line, for passing between agents"""
+        budget = f"${self.budget:,.0f}" if self.budget is not None else None
+        timeline = f"{self.timeline_start} to {self.timeline_end}" if self.timeline_start else None
+        fields = {"Company": self.company, "Contact": self.customer_name, "Needs": self.needs, "Budget": budget, "Timeline": timeline}
+        return "\n".join(f"{name}: {value}" for name, value in fields.items() if value is not None)
+
+class SQLStats:
+    """How generated SQL has fared: first-time successes, repairs and failures"""
+
+    def __init__(self):
+        self.queries = 0
+        self.first_try = 0
+        self.repaired = 0
+        self.failed = 0
+        self.retried = 0
+        self.repair_attempts = 0
+        self._lock = threading.Lock()
+
+    def record(self, repairs: int, succeeded: bool):
+        with self._lock:
+            self.queries += 1
+            self.repair_attempts += repairs
+            self.retried += bool(repairs)
+            if not succeeded:
+                self.failed += 1
+            elif repairs:
+                self.repaired += 1
+            else:
+                self.first_try += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counts plus success and retry rates, e.g. for a health endpoint"""
+        with self._lock:
+            queries = self.queries or 1
+            return {
+                "queries": self.queries,
+                "first_try": self.first_try,
+                "repaired": self.repaired,
+                "failed": self.failed,
+                "repair_attempts": self.repair_attempts,
+                "success_rate": (self.first_try + self.repaired) / queries,
+                "retry_rate": self.retried / queries,
+            }
 
 class LeadAgent:
-    def __init__(self, db_path: str = "lead_agent/leads.db"):
-        self.conn = duckdb.connect(db_path)
+    LEAD_BY_ID_SQL = f"SELECT {', '.join(Lead.model_fields)} FROM sales_leads WHERE id = ?"
+    # Results with only these columns are rendered as a "#ID: company - needs" list
+    LIST_COLUMNS = {"id", "customer_name", "company", "needs"}
+    # Rows rendered per page for listings, and rows sent to the LLM for summaries
+    page_size = 50
+    # Most matches a search without a current index collects before it stops scanning
+    search_scan_limit = 1000
+    max_summary_rows = 200
+    # Most tokens the result rows may take in the summary prompt
+    PROMPT_BUDGETS = {"lead.summary": 4000}
+    # Rows per Arrow record batch when streaming results, and the most memory a
+    # fully materialised result (QueryResult.to_arrow or .df) may take
+    batch_size = 65_536
+    max_result_bytes = 512 * 1024 * 1024
+    # Times a failing query is sent back to the LLM, with its error, for a correction
+    max_sql_repairs = 2
+    # Errors the LLM can fix: invalid SQL, unknown columns, refused or runaway plans.
+    # Timeouts and anything else fail straight away.
+    REPAIRABLE_ERRORS = (duckdb.Error, UnsafeQueryError)
+
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        sql_cache_path: Optional[str] = None,
+        read_only: bool = True,
+        use_sql_cache: bool = True,
+        source: Optional[Union[LeadSource, str, Sequence[str], Any]] = None,
+        batch_size: Optional[int] = None,
+        max_result_bytes: Optional[int] = None,
+        guard: Optional[SQLGuard] = None,
+    ):
+        self.sql_stats = SQLStats()
+        if batch_size is not None:
+            self.batch_size = batch_size
+        if max_result_bytes is not None:
+            self.max_result_bytes = max_result_bytes
+        sql_cache_path = sql_cache_path or os.getenv("LEAD_SQL_CACHE_PATH", "lead_agent/sql_cache.db")
+        # Leads in Parquet, CSV or Arrow are queried in place through a sales_leads view
+        if source is not None and not isinstance(source, LeadSource):
+            source = LeadSource(source)
+        self.source = source or (None if db_path else LeadSource.from_env())
+        if self.source is not None:
+            db_path = self.source.name
+            self.conn = get_connection(db_path, read_only, self.source.connect, self.source.setup_cursor)
+        else:
+            db_path = db_path or os.getenv("LEADS_DB_PATH", "lead_agent/leads.db")
+            # Shared, process-wide connection; opened read-only so many processes can query at once
+            self.conn = get_connection(db_path, read_only)
+        self.db_path = db_path
+        self.read_only = read_only
         # Verify database connection and table existence
-        tables = self.conn.execute("SELECT table_name FROM information_schema.tables WHERE table_name = 'sales_leads'").fetchall()
+        tables = self.cursor().execute("SELECT table_name FROM information_schema.tables WHERE table_name = 'sales_leads'").fetchall()
         if not tables:
             raise ValueError(f"Table 'sales_leads' not found in database '{db_path}'. Available tables: " + 
-                            str(self.conn.execute("SELECT table_name FROM information_schema.tables").fetchall()))
+                            str(self.cursor().execute("SELECT table_name FROM information_schema.tables").fetchall()))
         
-        self.llm = ChatOpenAI(
-            model=os.getenv("OPENAI_MODEL"),
-            base_url=os.getenv("OPENAI_BASE_URL"),
-            api_key=os.getenv("OPENAI_API_KEY"),
-        )
+        columns = self.cursor().execute(
+            "SELECT column_name, data_type FROM information_schema.columns WHERE table_name = 'sales_leads' ORDER BY ordinal_position"
+        ).fetchall()
+        # Hive partition keys derived from created_at, which generated SQL should filter on
+        self.partitions = created_at_partitions([name for name, _ in columns])
+        # Pre-aggregated counts and budgets that analytic questions read instead of the leads
+        self.summaries = LeadSummaries(self.cursor)
+        # Validates, limits and times out generated SQL before and while it runs;
+        # generated SQL may also read the summary tables while they cover every lead
+        summary_tables = tuple(LeadSummaries.GROUPS) if self._summaries_current else ()
+        self.guard = guard or SQLGuard(allowed_tables=("sales_leads", *summary_tables))
+
+        # Cache NL->SQL translations; set OPENAI_EMBEDDING_MODEL to also match similar queries
+        self.sql_cache = None
+        if use_sql_cache:
+            embeddings = None
+            if os.getenv("OPENAI_EMBEDDING_MODEL"):
+                from agent_common.llm import embeddings_model
+                embeddings = embeddings_model()
+            # Translations made with an older SQL prompt, or when the prompt offered other
+            # partition hints or summaries, are dropped like those of an older schema
+            context = [
+                ("prompt", prompt_version("lead.sql")),
+                ("partitions", sorted(self.partitions.items())),
+                ("summaries", self.summaries.last_id() if self._summaries_current else None),
+            ]
+            self.sql_cache = SQLCache(
+                sql_cache_path,
+                SQLCache.fingerprint([*columns, *context]),
+                model=model_for("sql"),
+                embeddings=embeddings,
+            )
         
-    def query_leads(self, query: str) -> pd.DataFrame:
-        """Execute a SQL query against the leads database"""
-        # Clean and validate the SQL query
+    @cached_property
+    def llm(self) -> Runnable:
+        """Fast chat model for SQL and summaries, created on first use so commands that never call it skip loading langchain"""
+        from agent_common.llm import chat_model
+        return chat_model("sql")
+
+    def cursor(self):
+        """Return this thread's cursor on the shared connection"""
+        return get_cursor(self.db_path, self.read_only)
+
+    @staticmethod
+    def _prepare_sql(query: str) -> str:
+        """Clean the SQL query, keeping only the first statement"""
         query = query.strip()
         # remove anything after a semicolon, if it exists
         if ';' in query:
             query = query[:query.find(';')]
-        return self.conn.execute(query).df()
+        return query
 
+    def query_leads(self, query: str) -> pd.DataFrame:
+        """Execute a SQL query against the leads database, within the same guard and memory ceiling as query_batches"""
+        return self.query_batches(query).df()
+
+    def query_batches(self, query: str, batch_size: Optional[int] = None) -> QueryResult:
+        """Execute a SQL query, streaming the results as Arrow record batches
+
+        The query must pass the agent's SQLGuard, which caps it at guard.max_rows
+        rows and interrupts it after guard.timeout seconds.
+        """
+        query = self._prepare_sql(query)
+        cursor = open_cursor(self.db_path, self.read_only)
+        try:
+            query = self.guard.check(cursor, query)
+            return QueryResult(
+                cursor,
+                query,
+                batch_size or self.batch_size,
+                self.max_result_bytes,
+                timeout=self.guard.timeout,
+                row_limit=self.guard.max_rows,
+            )
+        except BaseException:
+            cursor.close()
+            raise
+
+    def get_lead(self, lead_id: int) -> Optional[Lead]:
+        """Fetch a single lead by ID with a parameterised query, bypassing the LLM"""
+        with span("duckdb.query", sql=self.LEAD_BY_ID_SQL, lead_id=int(lead_id)):
+            row = self.cursor().execute(self.LEAD_BY_ID_SQL, [int(lead_id)]).fetchone()
+        if row is None:
+            return None
+        return Lead(**dict(zip(Lead.model_fields, row)))
+
+    async def aget_lead(self, lead_id: int) -> Optional[Lead]:
+        """Fetch a single lead by ID without blocking the event loop"""
+        return await asyncio.to_thread(self.get_lead, lead_id)
+
+    def list_lead_ids(self) -> List[int]:
+        """Return the IDs of all leads, in order"""
+        sql = "SELECT id FROM sales_leads ORDER BY id"
+        with span("duckdb.query", sql=sql):
+            return [row[0] for row in self.cursor().execute(sql).fetchall()]
+
+    def _partition_prompt(self) -> str:
+        """Describe the partition columns, so filters on created_at also prune partitions"""
+        if not self.partitions:
+            return ""
+        lines = "".join(
+            f"\n- {column} # partition column, always equal to {expression}"
+            for column, expression in self.partitions.items()
+        )
+        return f"""{lines}
+The data is stored in partitions by {", ".join(self.partitions)}. Whenever the query filters on created_at,
+also add the equivalent condition on {" and ".join(self.partitions)} so only the matching partitions are read."""
+
+    @cached_property
+    def _summaries_current(self) -> bool:
+        """Whether the summary tables cover every lead, checked once per agent
+
+        Summaries are never built over leads queried in place: that would scan the
+        whole source, and in-place sources are meant to be read only where a query
+        needs them. Ingest the leads into a database to get summaries. A writable
+        database brings its summaries up to date once here; afterwards LeadIngestor
+        keeps them current as it inserts.
+        """
+        if self.source is not None:
+            return False
+        if not self.read_only:
+            self.summaries.update()
+            return True
+        return self.summaries.is_current()
+
+    def _summary_prompt(self) -> str:
+        """Describe the summary tables, if they are up to date, so aggregates read them"""
+        return self.summaries.prompt() if self._summaries_current else ""
+
+    def _prompt_context(self) -> Dict[str, str]:
+        return {"partitions": self._partition_prompt(), "summaries": self._summary_prompt()}
+
+    def _sql_messages(self, query: str) -> List[tuple]:
+        """Build the messages that convert a natural language query to SQL"""
+        return get_prompt("lead.sql").messages(self._prompt_context(), query=query)
+
+    def _repair_messages(self, query: str, sql: str, error: Exception) -> List[tuple]:
+        """Build the messages that ask the LLM to correct a failing query"""
+        return get_prompt("lead.sql_repair").messages(self._prompt_context(), query=query, sql=sql, error=error)
+
+    @staticmethod
+    def _clean_sql(sql: str) -> str:
+        """Remove any markdown code block indicators if present"""
+        return sql.strip().replace('```sql', '').replace('```', '').strip()
+
+    @traced("lead.process_query")
     def process_query(self, query: str) -> str:
         """Convert natural language query to SQL"""
-        prompt = f"""You are a SQL expert. Convert the following natural language query into SQL.
-        The sales_leads table has columns: 
-        - id INTEGER # the unique identifier for the lead
-        - customer_name VARCHAR # the name of the lead
-        - company VARCHAR # the name of the company of the lead
-        - needs VARCHAR # the needs of the lead
-        - budget DECIMAL # the budget for the lead
-        - timeline_start DATE # the required start date of the lead's project
-        - timeline_end DATE # the required end date of the lead's project
-        - created_at TIMESTAMP # the date and time when the lead was created
-        
-        Query: {query}
-        
-        For listing or searching leads, always include id, customer_name, company, and needs in the output.
-        Sort results by id for consistency.
-        If searching, use ILIKE for case-insensitive matching.
-        
-        Important: Return only a single valid SQL query. Do not include backticks, markdown formatting, any explanation, or multiple options.
-        The query should be a simple SELECT statement that can be executed directly against the sales_leads table."""
-        
-        messages = [HumanMessage(content=prompt)]
-        sql = self.llm.invoke(messages).content.strip()
-        
-        # Remove any markdown code block indicators if present
-        sql = sql.replace('```sql', '').replace('```', '').strip()
+        if self.sql_cache:
+            sql = self.sql_cache.get(query)
+            if sql is not None:
+                return sql
+        return self._clean_sql(self.llm.invoke(self._sql_messages(query)).content)
+
+    @traced("lead.process_query")
+    async def aprocess_query(self, query: str) -> str:
+        """Convert natural language query to SQL without blocking the event loop"""
+        if self.sql_cache:
+            sql = await asyncio.to_thread(self.sql_cache.get, query)
+            if sql is not None:
+                return sql
+        messages = await asyncio.to_thread(self._sql_messages, query)
+        response = await self.llm.ainvoke(messages)
+        return self._clean_sql(response.content)
+
+    def _format_messages(self, results: QueryResult, query: str) -> List[tuple]:
+        """Build the messages that summarise aggregate query results"""
+        rows, total = results.head(self.max_summary_rows)
+        data = to_text(results.columns, rows)
+        if total > self.max_summary_rows:
+            data += f"\n(first {self.max_summary_rows} of {'more than ' if results.truncated else ''}{total} rows)"
+        data = token_ledger.compact("lead.summary", data, budget=self.PROMPT_BUDGETS.get("lead.summary"))
+        return get_prompt("lead.summary").messages({}, query=query, data=data)
+
+    def render_page(
+        self, columns: Sequence[str], rows: Sequence[tuple], total: int, page: int = 1, truncated: bool = False
+    ) -> Iterator[str]:
+        """Render one page of results that contain lead IDs, without the LLM
         
-        return sql
+        Narrow results are listed as "#ID: company - needs", anything wider as a
+        markdown table. `rows` holds just the requested page, out of `total` rows,
+        or out of more than `total` if the results were truncated at that many.
+        """
+        pages = max(1, -(-total // self.page_size))
+        start = (page - 1) * self.page_size
+        if truncated:
+            yield f"Found more than {total} leads; only the first {total} are shown.\n\n"
+        else:
+            yield f"Found {total} lead{'' if total == 1 else 's'}.\n\n"
+        if not rows and total:
+            yield f"Page {page} is past the last page ({pages}).\n"
+            return
+        if set(columns) <= self.LIST_COLUMNS:
+            for row in rows:
+                values = dict(zip(columns, row))
+                yield f"#{values['id']}: {values.get('company', '')} - {values.get('needs', '')}\n"
+        else:
+            yield "| " + " | ".join(columns) + " |\n"
+            yield "|" + "---|" * len(columns) + "\n"
+            for row in rows:
+                yield "| " + " | ".join(str(value).replace("|", "\\|") for value in row) + " |\n"
+        if start + len(rows) < total or page > 1:
+            yield f"\nShowing {start + 1}-{start + len(rows)} of {total} (page {page} of {pages}).\n"
 
-    def format_response(self, df: pd.DataFrame, query: str) -> str:
-        """Format the query results into a natural response"""
-        if "id" in df.columns:  # If this is a listing or search query
-            prompt = f"""Format this lead data into a clear list with IDs.
-            Original query: {query}
-            Data:
-            {df.to_string()}
-            
-            Format each lead as:
-            #ID: [company name] - [needs]
-            
-            Make sure the ID is clearly visible at the start of each line.
-            If this is a search result, mention the total count at the top."""
+    def render_rows(self, df: pd.DataFrame, page: int = 1) -> Iterator[str]:
+        """Render a page of a result DataFrame without the LLM; see render_page"""
+        start = (page - 1) * self.page_size
+        rows = list(df.iloc[start:start + self.page_size].itertuples(index=False, name=None))
+        yield from self.render_page(list(df.columns), rows, len(df), page)
+
+    def render_results(self, results: QueryResult, page: int = 1) -> str:
+        """Render a page of streamed results without the LLM; see render_page"""
+        rows, total = results.page(page, self.page_size)
+        return "".join(self.render_page(results.columns, rows, total, page, results.truncated))
+
+    def list_leads(self, page: int = 1) -> str:
+        """List leads as "#ID: company - needs", one page at a time, without the LLM"""
+        # Both bounds are integers we computed, and binding Python parameters makes
+        # DuckDB import pandas, which would dominate this command's start-up time
+        sql = f"SELECT id, company, needs FROM sales_leads ORDER BY id LIMIT {int(self.page_size)} OFFSET {int((page - 1) * self.page_size)}"
+        with span("duckdb.query", sql=sql):
+            cursor = self.cursor()
+            total = cursor.execute("SELECT count(*) FROM sales_leads").fetchone()[0]
+            rows = cursor.execute(sql).fetchall()
+        return "".join(self.render_page(["id", "company", "needs"], rows, total, page))
+
+    @cached_property
+    def search_index(self) -> Optional[LeadSearchIndex]:
+        """The full-text index stored with the leads, if it covers every lead; checked once per agent
+
+        An index is never built here, since that tokenises every lead. A writable
+        database adds the leads inserted since its index was last updated; leads
+        queried in place have no index.
+        """
+        if self.source is not None:
+            return None
+        index = LeadSearchIndex(self.cursor)
+        if not index.usable():
+            return None
+        if not self.read_only:
+            index.update()
+            return index
+        return index if index.is_current() else None
+
+    def search(self, text: str, page: int = 1) -> Tuple[List[tuple], int, bool]:
+        """Rank leads against free text, without the LLM
+
+        Returns one page of (id, company, needs) rows, best match first, the
+        number of matching leads, and whether that number is only a lower bound.
+        Without a current index the leads are scanned, stopping once
+        search_scan_limit leads match.
+        """
+        index = self.search_index
+        if index is not None:
+            ids, total = index.search(text, page, self.page_size)
+            truncated = False
         else:
-            prompt = f"""Given this data about leads and the original query, provide a natural language summary.
-            Original query: {query}
-            Data:
-            {df.to_string()}
-            
-            Format the response in a clear, business-friendly way."""
-        
-        messages = [HumanMessage(content=prompt)]
-        response = self.llm.invoke(messages).content
-        
-        return response
+            ids, total, truncated = scan_leads(self.cursor(), text, page, self.page_size, self.search_scan_limit)
+        if not ids:
+            return [], total, truncated
+        sql = f"SELECT id, company, needs FROM sales_leads WHERE id IN ({', '.join(str(int(id)) for id in ids)})"
+        with span("duckdb.query", sql=sql):
+            found = {row[0]: row for row in self.cursor().execute(sql).fetchall()}
+        return [found[id] for id in ids if id in found], total, truncated
 
-    def run(self, query: str) -> str:
+    @traced("lead.search_leads")
+    def search_leads(self, text: str, page: int = 1) -> str:
+        """Search company, customer name and needs, one ranked page at a time; see search"""
+        rows, total, truncated = self.search(text, page)
+        return "".join(self.render_page(["id", "company", "needs"], rows, total, page, truncated))
+
+    @traced("lead.format_response")
+    def format_response(self, results: QueryResult, query: str, page: int = 1) -> str:
+        """Format the query results into a natural response"""
+        if "id" in results.columns:  # If this is a listing or search query
+            return self.render_results(results, page)
+        messages = self._format_messages(results, query)
+        return self.llm.invoke(messages).content
+
+    @traced("lead.format_response")
+    async def aformat_response(self, results: QueryResult, query: str, page: int = 1) -> str:
+        """Format the query results into a natural response without blocking the event loop"""
+        if "id" in results.columns:
+            return await asyncio.to_thread(self.render_results, results, page)
+        messages = await asyncio.to_thread(self._format_messages, results, query)
+        response = await self.llm.ainvoke(messages)
+        return response.content
+
+    @traced("lead.format_response")
+    def stream_response(self, results: QueryResult, query: str, page: int = 1) -> Iterator[str]:
+        """Stream the formatted response token by token"""
+        if "id" in results.columns:
+            yield self.render_results(results, page)
+            return
+        messages = self._format_messages(results, query)
+        for chunk in self.llm.stream(messages):
+            yield chunk.content
+
+    @traced("lead.format_response")
+    async def astream_response(self, results: QueryResult, query: str, page: int = 1) -> AsyncIterator[str]:
+        """Stream the formatted response token by token without blocking the event loop"""
+        if "id" in results.columns:
+            yield await asyncio.to_thread(self.render_results, results, page)
+            return
+        messages = await asyncio.to_thread(self._format_messages, results, query)
+        async for chunk in self.llm.astream(messages):
+            yield chunk.content
+
+    def _check_repairable(self, error: Exception, sql: str, repairs: int):
+        """Re-raise a query's error unless another repair attempt is allowed"""
+        if isinstance(error, self.REPAIRABLE_ERRORS) and repairs < self.max_sql_repairs:
+            return
+        self.sql_stats.record(repairs, succeeded=False)
+        raise Exception(f"An error occurred: {str(error)}. SQL: {sql}")
+
+    @traced("lead.execute")
+    def execute(self, query: str) -> QueryResult:
+        """Translate a natural language query to SQL and return the raw results as a stream of record batches
+
+        If the SQL fails, the error is sent back to the LLM for a corrected query,
+        up to max_sql_repairs times. The guard validates and EXPLAINs each attempt
+        before running it, so most bad SQL fails before any data is scanned.
+        """
+        sql = self.process_query(query)
+        repairs = 0
+        while True:
+            try:
+                results = self.query_batches(sql)
+                break
+            except Exception as e:
+                self._check_repairable(e, sql, repairs)
+                repairs += 1
+                with span("lead.repair_sql", attempt=repairs, error=str(e)):
+                    sql = self._clean_sql(self.llm.invoke(self._repair_messages(query, sql, e)).content)
+        self.sql_stats.record(repairs, succeeded=True)
+        if self.sql_cache:
+            self.sql_cache.put(query, sql)
+        return results
+
+    @traced("lead.run")
+    def run(self, query: str, page: int = 1) -> str:
         """Process a natural language query about leads"""
-        try:
-            sql = self.process_query(query)
-            results = self.query_leads(sql)
-            response = self.format_response(results, query)
-            return response
-        except Exception as e:
-            raise Exception(f"An error occurred: {str(e)}. SQL: {sql}")
+        results = self.execute(query)
+        return self.format_response(results, query, page)
+
+    @traced("lead.run")
+    def stream(self, query: str, page: int = 1) -> Iterator[str]:
+        """Process a natural language query about leads, streaming the response"""
+        results = self.execute(query)
+        yield from self.stream_response(results, query, page)
+
+    @traced("lead.execute")
+    async def aexecute(self, query: str) -> QueryResult:
+        """Translate a natural language query to SQL and return the raw results as a stream of record batches
+
+        Failing SQL is repaired as in execute.
+        """
+        sql = await self.aprocess_query(query)
+        repairs = 0
+        while True:
+            try:
+                results = await asyncio.to_thread(self.query_batches, sql)
+                break
+            except Exception as e:
+                self._check_repairable(e, sql, repairs)
+                repairs += 1
+                with span("lead.repair_sql", attempt=repairs, error=str(e)):
+                    messages = await asyncio.to_thread(self._repair_messages, query, sql, e)
+                    response = await self.llm.ainvoke(messages)
+                    sql = self._clean_sql(response.content)
+        self.sql_stats.record(repairs, succeeded=True)
+        if self.sql_cache:
+            await asyncio.to_thread(self.sql_cache.put, query, sql)
+        return results
+
+    @traced("lead.run")
+    async def arun(self, query: str, page: int = 1) -> str:
+        """Process a natural language query about leads asynchronously"""
+        results = await self.aexecute(query)
+        return await self.aformat_response(results, query, page)
+
+    @traced("lead.run")
+    async def astream(self, query: str, page: int = 1) -> AsyncIterator[str]:
+        """Process a natural language query about leads, streaming the response asynchronously"""
+        results = await self.aexecute(query)
+        async for chunk in self.astream_response(results, query, page):
+            yield chunk
 
 def create_graph() -> Graph:
     """Create the langgraph workflow"""
+    # Imported here so that commands which never build a graph skip loading langgraph
+    from langchain_core.messages import AIMessage
+    from langgraph.graph import Graph
+    from langgraph.types import StreamWriter
+    from langgraph.utils.runnable import RunnableCallable
     lead_agent = LeadAgent()
     
-    def process_message(state: Dict[str, Any]):
+    def process_message(state: Dict[str, Any], writer: StreamWriter):
+        query = state["messages"][-1].content
+        chunks = []
+        with span("lead_agent.graph", query=query):
+            for chunk in lead_agent.stream(query, page=state.get("page", 1)):
+                writer(chunk)
+                chunks.append(chunk)
+        state["messages"].append(AIMessage(content="".join(chunks)))
+        return state
+    
+    async def aprocess_message(state: Dict[str, Any], writer: StreamWriter):
         query = state["messages"][-1].content
-        response = lead_agent.run(query)
-        state["messages"].append(AIMessage(content=response))
+        chunks = []
+        with span("lead_agent.graph", query=query):
+            async for chunk in lead_agent.astream(query, page=state.get("page", 1)):
+                writer(chunk)
+                chunks.append(chunk)
+        state["messages"].append(AIMessage(content="".join(chunks)))
         return state
     
     workflow = Graph()
-    workflow.add_node("process_message", process_message)
+    workflow.add_node("process_message", RunnableCallable(process_message, aprocess_message))
     workflow.set_entry_point("process_message")
     workflow.set_finish_point("process_message")
 
@@ -0,0 +1,162 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Iterator, List, Optional, Sequence, Tuple
+import threading
+import duckdb
+from agent_common.tracing import tracer
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+class ResultTooLargeError(ValueError):
+    """Raised when materialising a result would exceed its memory ceiling"""
+
+class QueryResult:
+    """The results of a query, read from DuckDB as a stream of Arrow record batches
+
+    Nothing is materialised up front: each batch of `batch_size` rows is produced
+    only when the consumer asks for it, so paging through or summarising a large
+    result holds one batch in memory at a time, and batches are handed on as
+    zero-copy Arrow data rather than converted to pandas. Only `to_arrow` and `df`
+    hold the whole result, and they raise ResultTooLargeError beyond `max_bytes`.
+
+    A result can be read once. It owns its cursor, because running another query
+    on the cursor that produced a stream silently ends that stream. With a
+    `timeout`, the query is interrupted that many seconds after it starts unless
+    the result has been read or closed by then. With a `row_limit`, rows past the
+    limit are dropped and `truncated` is set.
+
+    Most of the query runs while the batches are read, so its duckdb.query span
+    lasts until the result is read or closed, and records the rows and bytes read.
+    """
+
+    def __init__(
+        self,
+        cursor: duckdb.DuckDBPyConnection,
+        sql: str,
+        batch_size: int,
+        max_bytes: int,
+        timeout: Optional[float] = None,
+        row_limit: Optional[int] = None,
+    ):
+        self.sql = sql
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.row_limit = row_limit
+        self.rows_read = 0
+        self.bytes_read = 0
+        self.truncated = False
+        self._cursor = cursor
+        self._consumed = False
+        self._timer = None
+        self._span = tracer.start_span("duckdb.query", sql=sql, batch_size=batch_size)
+        if timeout:
+            self._timer = threading.Timer(timeout, cursor.interrupt)
+            self._timer.daemon = True
+            self._timer.start()
+        try:
+            self.reader = cursor.execute(sql).fetch_record_batch(batch_size)
+        except duckdb.InterruptException:
+            error = self._timed_out()
+            self.close(error)
+            raise error
+        except BaseException as e:
+            self.close(e)
+            raise
+
+    @property
+    def columns(self) -> List[str]:
+        return self.reader.schema.names
+
+    def __iter__(self) -> Iterator[pa.RecordBatch]:
+        """Yield the record batches as DuckDB produces them"""
+        if self._consumed:
+            raise ValueError("Query results can only be read once")
+        self._consumed = True
+        try:
+            for batch in self.reader:
+                if self.row_limit is not None and self.rows_read + batch.num_rows > self.row_limit:
+                    batch = batch.slice(0, self.row_limit - self.rows_read)
+                    self.truncated = True
+                self.rows_read += batch.num_rows
+                self.bytes_read += batch.nbytes
+                yield batch
+                if self.truncated:
+                    break
+        except duckdb.InterruptException:
+            error = self._timed_out()
+            self.close(error)
+            raise error
+        except GeneratorExit:
+            # The consumer stopped early, e.g. after one page; that is not a failure
+            raise
+        except BaseException as e:
+            self.close(e)
+            raise
+        finally:
+            self.close()
+
+    def _timed_out(self) -> TimeoutError:
+        return TimeoutError(f"Query was interrupted after {self.timeout:g}s. SQL: {self.sql}")
+
+    def close(self, error: Optional[BaseException] = None):
+        """Release the cursor, and with it whatever DuckDB still buffers for the result"""
+        self._consumed = True
+        if self._timer is not None:
+            self._timer.cancel()
+        self._cursor.close()
+        if self._span is not None:
+            self._span.set(rows=self.rows_read, bytes=self.bytes_read, truncated=self.truncated or None)
+            if error is not None:
+                self._span.status = "ERROR"
+                self._span.set(error=repr(error))
+            tracer.end_span(self._span)
+            self._span = None
+
+    def page(self, page: int, page_size: int) -> Tuple[List[tuple], int]:
+        """Return the rows of one page and the total number of rows
+
+        Every batch is counted, but only the rows on the page are converted to
+        Python objects.
+        """
+        start, stop = (page - 1) * page_size, page * page_size
+        rows: List[tuple] = []
+        offset = 0
+        for batch in self:
+            low, high = max(start - offset, 0), min(stop - offset, batch.num_rows)
+            if low < high:
+                rows.extend(batch_rows(batch.slice(low, high - low)))
+            offset += batch.num_rows
+        return rows, offset
+
+    def head(self, n: int) -> Tuple[List[tuple], int]:
+        """Return the first n rows and the total number of rows"""
+        return self.page(1, n)
+
+    def to_arrow(self) -> pa.Table:
+        """Collect every batch into one Arrow table, within the memory ceiling"""
+        import pyarrow as pa
+        batches = []
+        for batch in self:
+            if self.bytes_read > self.max_bytes:
+                error = ResultTooLargeError(
+                    f"Query result exceeds {self.max_bytes:,} bytes after {self.rows_read:,} rows. SQL: {self.sql}"
+                )
+                self.close(error)
+                raise error
+            batches.append(batch)
+        return pa.Table.from_batches(batches, schema=self.reader.schema)
+
+    def df(self) -> pd.DataFrame:
+        """Collect the result as a pandas DataFrame, within the memory ceiling"""
+        return self.to_arrow().to_pandas()
+
+def batch_rows(batch: pa.RecordBatch) -> List[tuple]:
+    """Convert a record batch to a list of row tuples"""
+    return list(zip(*(column.to_pylist() for column in batch.columns)))
+
+def to_text(columns: Sequence[str], rows: Sequence[tuple]) -> str:
+    """Render rows as a plain text table, e.g. for an LLM prompt"""
+    lines = [" | ".join(columns)]
+    lines.extend(" | ".join(str(value) for value in row) for row in rows)
+    return "\n".join(lines)
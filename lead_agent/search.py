@@ -0,0 +1,282 @@
+from typing import Callable, List, Optional, Tuple
+from functools import cached_property
+import re
+import threading
+import unicodedata
+import duckdb
+from agent_common.tracing import span
+
+# Text is lower-cased, stripped of accents and split on anything other than a
+# letter or digit
+TOKEN_SEPARATOR = "[^a-z0-9]+"
+
+def _literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+def query_terms(text: str) -> List[str]:
+    """Split search text into distinct unstemmed terms, the way the index splits leads"""
+    text = unicodedata.normalize("NFKD", text.lower()).encode("ascii", "ignore").decode()
+    return sorted({term for term in re.split(TOKEN_SEPARATOR, text) if term})
+
+def scan_leads(
+    cursor: duckdb.DuckDBPyConnection,
+    text: str,
+    page: int = 1,
+    page_size: int = 50,
+    limit: int = 1000,
+    source: str = "sales_leads",
+) -> Tuple[List[int], int, bool]:
+    """Search the leads without an index, stopping at the first `limit` matches
+
+    Leads containing any of the terms are ranked by how many they contain. The
+    scan ends as soon as `limit` leads match, so a common term costs a fraction
+    of the data; a rare one still reads the three text columns in full. Returns
+    one page of IDs, the number of matches found, and whether it stopped early.
+    """
+    terms = query_terms(text)
+    if not terms:
+        return [], 0, False
+    document = "lower(strip_accents(concat_ws(' ', company, customer_name, needs)))"
+    # Terms are only letters and digits, so they are safe inside the pattern
+    hits = " + ".join(f"({document} LIKE '%{term}%')::INTEGER" for term in terms)
+    offset = (page - 1) * page_size
+    with span("lead_search.scan", page=page) as s:
+        found, ids = cursor.execute(f"""
+            WITH matches AS MATERIALIZED (
+                SELECT id, {hits} AS score FROM {source} WHERE {hits} > 0 LIMIT {int(limit) + 1}
+            )
+            SELECT
+                (SELECT count(*) FROM matches),
+                (SELECT list(id) FROM (
+                    SELECT id FROM matches ORDER BY score DESC, id LIMIT {int(page_size)} OFFSET {int(offset)}
+                ))
+        """).fetchone()
+        s.set(matches=found)
+    return ids or [], min(found, limit), found > limit
+
+def load_fts(cursor: duckdb.DuckDBPyConnection, install: bool = False) -> bool:
+    """Load DuckDB's FTS extension; False if it is unavailable
+
+    Installing downloads the extension, so only explicit index builds ask for it;
+    a search on an offline host should not wait for a network timeout.
+    """
+    try:
+        cursor.execute("LOAD fts")
+    except duckdb.Error:
+        if not install:
+            return False
+        try:
+            cursor.execute("INSTALL fts")
+            cursor.execute("LOAD fts")
+        except duckdb.Error:
+            return False
+    return True
+
+class LeadSearchIndex:
+    """BM25 full-text index over the leads' company, customer name and needs
+
+    Tokens are stemmed with the FTS extension's Porter stemmer and kept in three
+    tables next to the leads: lead_search_terms (each term and how many leads
+    contain it), lead_search_postings (term frequency and lead length per term and
+    lead, ordered by term) and lead_search_meta (the highest indexed lead ID and
+    corpus totals). DuckDB's own create_fts_index can only be rebuilt from scratch,
+    so instead `update` tokenises just the leads whose ID is past the highest one
+    indexed and adds them to these tables; leads are append-only. Searching ranks
+    every lead containing any query term with BM25 and never involves the LLM.
+
+    Without the FTS extension (e.g. offline) terms are not stemmed. The stemmer is
+    recorded in lead_search_meta, and searches and updates stem the way the index
+    was built; an index stemmed with Porter cannot be used where FTS is unavailable.
+    With `install`, for explicit builds, FTS is downloaded if needed and an
+    unstemmed index is rebuilt with Porter on the next update. Building an index tokenises every lead, seconds per million, so it is only
+    done on request (the generator, LeadIngestor, `lead_agent/cli.py index`);
+    searches without a current index use scan_leads instead.
+    """
+    k1 = 1.2
+    b = 0.75
+    TABLES = ("lead_search_terms", "lead_search_postings", "lead_search_meta")
+
+    def __init__(self, cursor: Callable[[], duckdb.DuckDBPyConnection], source: str = "sales_leads", install: bool = False):
+        self.cursor = cursor
+        self.source = source
+        self.install = install
+        self._lock = threading.Lock()
+
+    @cached_property
+    def fts(self) -> bool:
+        """Whether the FTS extension, and with it the Porter stemmer, is available; loaded on first use"""
+        return load_fts(self.cursor(), self.install)
+
+    @property
+    def stemmer(self) -> str:
+        """Stemmer a new index is built with"""
+        return "porter" if self.fts else "none"
+
+    @staticmethod
+    def _stem(token: str, stemmer: str) -> str:
+        return f"stem({token}, 'porter')" if stemmer == "porter" else token
+
+    def _tokens(self, text: str) -> str:
+        return f"unnest(regexp_split_to_array(lower(strip_accents({text})), '{TOKEN_SEPARATOR}'))"
+
+    def exists(self) -> bool:
+        tables = self.cursor().execute(
+            f"SELECT count(*) FROM duckdb_tables() WHERE database_name = current_database() AND table_name IN {self.TABLES}"
+        ).fetchone()[0]
+        return tables == len(self.TABLES)
+
+    def built_stemmer(self) -> Optional[str]:
+        """Stemmer the index was built with, or None if there is no index"""
+        if not self.exists():
+            return None
+        return self.cursor().execute("SELECT stemmer FROM lead_search_meta").fetchone()[0]
+
+    def usable(self) -> bool:
+        """Whether the index exists and its terms can be stemmed the same way here"""
+        stemmer = self.built_stemmer()
+        return stemmer == "none" or (stemmer == "porter" and self.fts)
+
+    def is_current(self) -> bool:
+        """Whether the index is usable and covers every lead"""
+        if not self.usable():
+            return False
+        cursor = self.cursor()
+        last_id = cursor.execute("SELECT last_id FROM lead_search_meta").fetchone()[0]
+        return last_id == cursor.execute(f"SELECT coalesce(max(id), 0) FROM {self.source}").fetchone()[0]
+
+    def drop(self):
+        """Remove the index, e.g. when the leads it covers are replaced"""
+        with self._lock:
+            for table in self.TABLES:
+                self.cursor().execute(f"DROP TABLE IF EXISTS {table}")
+
+    def _create(self, cursor: duckdb.DuckDBPyConnection):
+        cursor.execute("CREATE TABLE IF NOT EXISTS lead_search_terms (term_id INTEGER, term VARCHAR, df BIGINT)")
+        cursor.execute("CREATE TABLE IF NOT EXISTS lead_search_postings (term_id INTEGER, lead_id BIGINT, tf INTEGER, doc_len INTEGER)")
+        cursor.execute("CREATE TABLE IF NOT EXISTS lead_search_meta (stemmer VARCHAR, last_id BIGINT, docs BIGINT, tokens BIGINT)")
+        if cursor.execute("SELECT count(*) FROM lead_search_meta").fetchone()[0] == 0:
+            cursor.execute(f"INSERT INTO lead_search_meta VALUES ({_literal(self.stemmer)}, 0, 0, 0)")
+
+    def update(self) -> int:
+        """Index the leads added since the last update; returns how many were added"""
+        with self._lock, span("lead_search.update") as s:
+            cursor = self.cursor()
+            self._create(cursor)
+            stemmer, last_id = cursor.execute("SELECT stemmer, last_id FROM lead_search_meta").fetchone()
+            max_id = cursor.execute(f"SELECT coalesce(max(id), 0) FROM {self.source}").fetchone()[0]
+            # An unusable stemmer, Porter becoming available to an explicit build, or
+            # fewer leads than were indexed, means starting over
+            rebuild = (
+                max_id < last_id
+                or (stemmer == "porter" and not self.fts)
+                or (self.install and stemmer != self.stemmer)
+            )
+            if rebuild:
+                last_id = 0
+                stemmer = self.stemmer
+            elif max_id == last_id:
+                s.set(added=0)
+                return 0
+            cursor.execute("BEGIN TRANSACTION")
+            try:
+                if rebuild:
+                    cursor.execute("DELETE FROM lead_search_terms")
+                    cursor.execute("DELETE FROM lead_search_postings")
+                    cursor.execute(f"UPDATE lead_search_meta SET stemmer = {_literal(stemmer)}, last_id = 0, docs = 0, tokens = 0")
+                added = self._add(cursor, last_id, max_id, stemmer)
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            s.set(added=added, rebuilt=rebuild)
+            return added
+
+    def _add(self, cursor: duckdb.DuckDBPyConnection, after_id: int, max_id: int, stemmer: str) -> int:
+        """Add the leads with IDs in (after_id, max_id] to the index, stemmed with `stemmer`"""
+        leads = f"SELECT id, company, customer_name, needs FROM {self.source} WHERE id > {int(after_id)} AND id <= {int(max_id)}"
+        # Company names and needs repeat across leads, so each distinct value is
+        # tokenised and stemmed once and its terms joined back onto the leads
+        cursor.execute(f"""
+            CREATE OR REPLACE TEMP TABLE lead_search_texts AS
+            WITH leads AS ({leads}),
+            texts AS (
+                SELECT company AS text FROM leads UNION SELECT customer_name FROM leads UNION SELECT needs FROM leads
+            ), tokens AS (
+                SELECT text, {self._tokens('text')} AS token FROM texts
+            )
+            SELECT text, {self._stem('token', stemmer)} AS term, count(*) AS tf FROM tokens WHERE token <> '' GROUP BY ALL
+        """)
+        cursor.execute("""
+            INSERT INTO lead_search_terms
+            SELECT (SELECT coalesce(max(term_id), 0) FROM lead_search_terms) + row_number() OVER (ORDER BY term), term, 0
+            FROM (SELECT DISTINCT term FROM lead_search_texts) AS new
+            WHERE NOT EXISTS (SELECT 1 FROM lead_search_terms t WHERE t.term = new.term)
+        """)
+        cursor.execute(f"""
+            CREATE OR REPLACE TEMP TABLE lead_search_new AS
+            WITH leads AS ({leads}),
+            text_terms AS (
+                SELECT x.text, t.term_id, sum(x.tf) AS tf FROM lead_search_texts x JOIN lead_search_terms t USING (term) GROUP BY ALL
+            ), text_lengths AS (
+                SELECT text, sum(tf) AS len FROM text_terms GROUP BY text
+            ), lead_terms AS (
+                SELECT id, term_id, tf FROM leads JOIN text_terms ON text = company
+                UNION ALL SELECT id, term_id, tf FROM leads JOIN text_terms ON text = customer_name
+                UNION ALL SELECT id, term_id, tf FROM leads JOIN text_terms ON text = needs
+            ), lead_lengths AS (
+                SELECT id, coalesce(c.len, 0) + coalesce(n.len, 0) + coalesce(d.len, 0) AS doc_len FROM leads
+                LEFT JOIN text_lengths c ON c.text = company
+                LEFT JOIN text_lengths n ON n.text = customer_name
+                LEFT JOIN text_lengths d ON d.text = needs
+            )
+            SELECT id AS lead_id, term_id, tf, doc_len
+            FROM (SELECT id, term_id, sum(tf)::INTEGER AS tf FROM lead_terms GROUP BY id, term_id) JOIN lead_lengths USING (id)
+        """)
+        cursor.execute("""
+            UPDATE lead_search_terms SET df = lead_search_terms.df + new.docs
+            FROM (SELECT term_id, count(*) AS docs FROM lead_search_new GROUP BY term_id) AS new
+            WHERE lead_search_terms.term_id = new.term_id
+        """)
+        # Ordered by term, so a search's term filter can skip most row groups
+        cursor.execute("INSERT INTO lead_search_postings SELECT term_id, lead_id, tf, doc_len FROM lead_search_new ORDER BY term_id, lead_id")
+        added, tokens = cursor.execute("SELECT count(DISTINCT lead_id), coalesce(sum(tf), 0) FROM lead_search_new").fetchone()
+        cursor.execute(f"UPDATE lead_search_meta SET last_id = {int(max_id)}, docs = docs + {int(added)}, tokens = tokens + {int(tokens)}")
+        cursor.execute("DROP TABLE lead_search_texts")
+        cursor.execute("DROP TABLE lead_search_new")
+        return added
+
+    def search(self, text: str, page: int = 1, page_size: int = 50) -> Tuple[List[int], int]:
+        """IDs of one page of matching leads, best match first, and the number of matches
+
+        The text is only ever bound as a string literal, never interpreted as SQL.
+        Query terms are stemmed the way the index was built.
+        """
+        stemmer = self.built_stemmer()
+        offset = (page - 1) * page_size
+        with span("lead_search.search", page=page) as s:
+            total, ids = self.cursor().execute(f"""
+                WITH query AS (
+                    SELECT DISTINCT {self._stem('token', stemmer)} AS term
+                    FROM (SELECT {self._tokens(_literal(text))} AS token) WHERE token <> ''
+                ), matched AS (
+                    SELECT term_id, df FROM lead_search_terms JOIN query USING (term)
+                ), stats AS (
+                    SELECT docs, tokens / greatest(docs, 1) AS avg_len FROM lead_search_meta
+                ), scores AS (
+                    SELECT p.lead_id, sum(
+                        ln(1 + (stats.docs - m.df + 0.5) / (m.df + 0.5))
+                        * p.tf * ({self.k1} + 1)
+                        / (p.tf + {self.k1} * (1 - {self.b} + {self.b} * p.doc_len / stats.avg_len))
+                    ) AS score
+                    FROM lead_search_postings p JOIN matched m USING (term_id) CROSS JOIN stats
+                    GROUP BY p.lead_id
+                )
+                SELECT
+                    (SELECT count(*) FROM scores),
+                    (SELECT list(lead_id) FROM (
+                        SELECT lead_id FROM scores ORDER BY score DESC, lead_id
+                        LIMIT {int(page_size)} OFFSET {int(offset)}
+                    ))
+            """).fetchone()
+            s.set(matches=total)
+        return ids or [], total
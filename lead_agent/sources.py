@@ -0,0 +1,140 @@
+from typing import Any, Dict, List, Optional, Sequence, Union
+import glob
+import hashlib
+import os
+import re
+import duckdb
+
+# Hive partition keys that can be derived from created_at, and the expression each
+# one equals. The NL->SQL prompt asks for a filter on the key alongside any filter
+# on created_at, which is what lets DuckDB skip whole partitions.
+CREATED_AT_PARTITIONS = {
+    "created_date": "CAST(created_at AS DATE)",
+    "created_month": "strftime(created_at, '%Y-%m')",
+    "created_year": "year(created_at)",
+    "year": "year(created_at)",
+    "month": "month(created_at)",
+    "day": "day(created_at)",
+}
+
+FORMATS = {
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".csv": "csv",
+    ".tsv": "csv",
+    ".jsonl": "json",
+    ".ndjson": "json",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+}
+
+_HIVE_KEY = re.compile(r"[\\/]([^\\/=]+)=[^\\/]*(?=[\\/])")
+
+def detect_format(location: str) -> str:
+    """Infer a source's file format from its extension, ignoring compression suffixes"""
+    path = re.sub(r"\.(gz|zst|zstd|snappy|lz4)$", "", location.lower())
+    for extension, format in FORMATS.items():
+        if path.endswith(extension):
+            return format
+    raise ValueError(f"Cannot tell the format of '{location}'; expected one of {', '.join(FORMATS)}")
+
+def hive_keys(path: str) -> List[str]:
+    """Names of the key=value directories in a path, outermost first"""
+    return _HIVE_KEY.findall(path.replace("\\", "/"))
+
+def created_at_partitions(columns: Sequence[str]) -> Dict[str, str]:
+    """The partition keys among some columns, mapped to their created_at expressions"""
+    return {column: CREATED_AT_PARTITIONS[column] for column in columns if column in CREATED_AT_PARTITIONS}
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+class LeadSource:
+    """Lead data kept outside DuckDB, exposed to the agent as the sales_leads view
+
+    A source is one or more Parquet, CSV or JSONL globs, local or remote (s3://, https://),
+    or an Arrow object: a pyarrow Table or Dataset, such as
+    `pyarrow.dataset.dataset("leads/", partitioning="hive")`. Arrow IPC files are
+    opened as Arrow datasets. Nothing is copied: the view reads the files in
+    place, and DuckDB pushes the columns and filters of each query down into the
+    scan, reading only the row groups, and with hive partitioning only the
+    directories, that can match.
+
+    Hive keys derived from created_at (see CREATED_AT_PARTITIONS) are described to
+    the LLM so generated SQL filters on them too and prunes partitions by date.
+    """
+
+    def __init__(self, location: Union[str, Sequence[str], Any], format: Optional[str] = None):
+        if isinstance(location, str):
+            location = [location]
+        if isinstance(location, (list, tuple)):
+            self.paths: List[str] = list(location)
+            self.arrow = None
+            self.format = format or detect_format(self.paths[0])
+        else:
+            self.paths = []
+            self.arrow = location
+            self.format = "arrow"
+        if self.format == "arrow" and self.paths:
+            self.arrow = self._ipc_dataset(self.paths)
+        if self.format not in ("parquet", "csv", "json", "arrow"):
+            raise ValueError(f"Unsupported lead source format: {self.format}")
+
+    @staticmethod
+    def _ipc_dataset(paths: Sequence[str]) -> Any:
+        """Open local Arrow IPC files as one dataset; DuckDB has no native reader for them"""
+        import pyarrow.dataset as ds
+        files = sorted(f for path in paths for f in glob.glob(path, recursive=True))
+        if not files:
+            raise ValueError(f"No files match lead source '{paths[0]}'")
+        # Hive keys are read from the directories below the first wildcard
+        base = os.path.dirname(re.split(r"[*?\[]", paths[0])[0]) or "."
+        return ds.dataset(files, format="ipc", partitioning="hive", partition_base_dir=base)
+
+    @classmethod
+    def from_env(cls) -> Optional["LeadSource"]:
+        """The source named by LEADS_SOURCE, a comma-separated list of globs, if set"""
+        location = os.getenv("LEADS_SOURCE")
+        if not location:
+            return None
+        return cls([path.strip() for path in location.split(",") if path.strip()])
+
+    @property
+    def name(self) -> str:
+        """Identifies the source, to share one connection per source across agents"""
+        if self.arrow is not None and not self.paths:
+            return f":memory:arrow-{id(self.arrow)}"
+        digest = hashlib.sha256("\0".join([self.format, *self.paths]).encode()).hexdigest()[:16]
+        return f":memory:{self.format}-{digest}"
+
+    def scan_sql(self, conn: duckdb.DuckDBPyConnection) -> str:
+        """The table function that reads the files, with hive partitioning if they use it"""
+        files = conn.execute(f"SELECT file FROM glob({_quote(self.paths[0])}) LIMIT 1").fetchone()
+        if files is None:
+            raise ValueError(f"No files match lead source '{self.paths[0]}'")
+        keys = hive_keys(files[0])
+        paths = "[" + ", ".join(_quote(path) for path in self.paths) + "]"
+        options = ["union_by_name = true"]
+        if keys:
+            options.append("hive_partitioning = true")
+        if self.format == "parquet":
+            return f"read_parquet({paths}, {', '.join(options)})"
+        if self.format == "json":
+            return f"read_json({paths}, format = 'newline_delimited', {', '.join(options)})"
+        return f"read_csv({paths}, {', '.join(options)})"
+
+    def connect(self) -> duckdb.DuckDBPyConnection:
+        """Open an in-memory database whose sales_leads view reads this source"""
+        conn = duckdb.connect(":memory:")
+        if self.arrow is not None:
+            # Registered objects are visible to one connection only; see setup_cursor
+            self.setup_cursor(conn)
+        else:
+            conn.execute(f"CREATE VIEW sales_leads AS SELECT * FROM {self.scan_sql(conn)}")
+        return conn
+
+    def setup_cursor(self, cursor: duckdb.DuckDBPyConnection):
+        """Make an Arrow source visible to a new cursor as the sales_leads view"""
+        if self.arrow is not None:
+            cursor.register("sales_leads", self.arrow)
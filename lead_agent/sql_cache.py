@@ -0,0 +1,152 @@
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from agent_common.tracing import span
+
+def normalize_query(query: str) -> str:
+    """Normalise a natural language query so trivial variations share a cache entry"""
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.rstrip(" .?!")
+
+class SQLCache:
+    """Persistent cache of natural language to SQL translations
+
+    Entries are keyed on the normalised query text, the model that produced the SQL
+    and a fingerprint of the sales_leads schema, so a schema change invalidates every
+    translation made against the old schema. Entries expire after `ttl` seconds and
+    the least recently used entries are evicted once `max_entries` is exceeded.
+
+    If an embeddings model is supplied, a miss on the exact key falls back to the most
+    similar cached query whose cosine similarity is at least `similarity_threshold`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        schema_fingerprint: str,
+        model: Optional[str] = None,
+        ttl: float = 7 * 24 * 3600,
+        max_entries: int = 1000,
+        embeddings: Optional[Any] = None,
+        similarity_threshold: float = 0.95,
+    ):
+        self.schema_fingerprint = schema_fingerprint
+        self.model = model or ""
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Embeddings computed on a miss, reused when the translation is stored
+        self._pending_embeddings: Dict[str, List[float]] = {}
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS sql_cache (
+                query TEXT,
+                model TEXT,
+                schema_fingerprint TEXT,
+                sql TEXT,
+                embedding TEXT,
+                created_at REAL,
+                last_used REAL,
+                PRIMARY KEY (query, model, schema_fingerprint)
+            )
+        """)
+        # Translations made against an older schema can never be valid again
+        self.conn.execute("DELETE FROM sql_cache WHERE schema_fingerprint != ?", [schema_fingerprint])
+        self.conn.commit()
+
+    @staticmethod
+    def fingerprint(columns: List[tuple]) -> str:
+        """Hash a list of (column_name, data_type) rows into a schema fingerprint"""
+        return hashlib.sha256(json.dumps(columns, default=str).encode()).hexdigest()
+
+    def get(self, query: str) -> Optional[str]:
+        """Return the cached SQL for a query, or None on a miss"""
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock, span("sql_cache.get") as s:
+            self.conn.execute(
+                "DELETE FROM sql_cache WHERE created_at < ?", [now - self.ttl]
+            )
+            row = self.conn.execute(
+                "SELECT rowid, sql FROM sql_cache WHERE query = ? AND model = ? AND schema_fingerprint = ?",
+                [key, self.model, self.schema_fingerprint],
+            ).fetchone()
+            if row is None and self.embeddings is not None:
+                row = self._similar(key)
+                s.set(similar=row is not None)
+            s.set(hit=row is not None)
+            if row is None:
+                self.misses += 1
+                self.conn.commit()
+                return None
+            self.conn.execute("UPDATE sql_cache SET last_used = ? WHERE rowid = ?", [now, row[0]])
+            self.conn.commit()
+            self.hits += 1
+            return row[1]
+
+    def _similar(self, key: str) -> Optional[tuple]:
+        """Find the cached translation of the most similar query"""
+        # Only needed with embeddings configured, so keep it off the start-up path
+        import numpy as np
+        vector = self.embeddings.embed_query(key)
+        if len(self._pending_embeddings) > self.max_entries:
+            self._pending_embeddings.clear()
+        self._pending_embeddings[key] = vector
+        rows = self.conn.execute(
+            "SELECT rowid, sql, embedding FROM sql_cache WHERE model = ? AND schema_fingerprint = ? AND embedding IS NOT NULL",
+            [self.model, self.schema_fingerprint],
+        ).fetchall()
+        if not rows:
+            return None
+        matrix = np.array([json.loads(embedding) for _, _, embedding in rows])
+        query_vector = np.array(vector)
+        scores = matrix @ query_vector / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_vector))
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+        return rows[best][:2]
+
+    def put(self, query: str, sql: str):
+        """Store a translation that executed successfully"""
+        key = normalize_query(query)
+        with self._lock:
+            embedded = self.conn.execute(
+                "SELECT 1 FROM sql_cache WHERE query = ? AND model = ? AND schema_fingerprint = ? AND embedding IS NOT NULL",
+                [key, self.model, self.schema_fingerprint],
+            ).fetchone()
+        embedding = None
+        if self.embeddings is not None and not embedded:
+            vector = self._pending_embeddings.pop(key, None)
+            if vector is None:
+                vector = self.embeddings.embed_query(key)
+            embedding = json.dumps(vector)
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                """INSERT INTO sql_cache VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (query, model, schema_fingerprint)
+                DO UPDATE SET sql = excluded.sql, embedding = COALESCE(excluded.embedding, embedding), last_used = excluded.last_used""",
+                [key, self.model, self.schema_fingerprint, sql, embedding, now, now],
+            )
+            self.conn.execute(
+                """DELETE FROM sql_cache WHERE rowid IN (
+                    SELECT rowid FROM sql_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )""",
+                [self.max_entries],
+            )
+            self.conn.commit()
+
+    def clear(self):
+        """Remove every cached translation"""
+        with self._lock:
+            self.conn.execute("DELETE FROM sql_cache")
+            self.conn.commit()
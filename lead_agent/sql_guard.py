@@ -0,0 +1,132 @@
+from typing import Any, Dict, Iterable, Iterator, Optional, Set
+import json
+import duckdb
+from agent_common.tracing import span
+
+class UnsafeQueryError(ValueError):
+    """Raised for SQL the agent refuses to run"""
+
+def _literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+def _walk(node: Any) -> Iterator[Dict[str, Any]]:
+    """Yield every object in a serialised DuckDB syntax tree"""
+    if isinstance(node, dict):
+        yield node
+        for value in node.values():
+            yield from _walk(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk(value)
+
+def _limit_modifier(limit: int) -> Dict[str, Any]:
+    return {
+        "type": "LIMIT_MODIFIER",
+        "limit": {
+            "class": "CONSTANT", "type": "VALUE_CONSTANT", "alias": "", "query_location": 0,
+            "value": {"type": {"id": "BIGINT", "type_info": None}, "is_null": False, "value": limit},
+        },
+        "offset": None,
+    }
+
+class SQLGuard:
+    """Checks LLM-generated SQL before it runs, and bounds it while it runs
+
+    A query must be a single SELECT that reads only the allowed tables (and its own
+    CTEs); table functions such as read_csv are refused, since they would reach
+    past the leads to the file system or network. Results are capped at `max_rows`
+    by adding or lowering the query's LIMIT, the plan DuckDB's EXPLAIN estimates
+    is refused if any operator expects more than `max_estimated_rows` rows, which
+    catches accidental cross joins before they start, and `timeout` seconds after
+    it starts a query is interrupted.
+    """
+
+    def __init__(
+        self,
+        max_rows: int = 10_000,
+        max_estimated_rows: int = 100_000_000,
+        timeout: Optional[float] = 30.0,
+        allowed_tables: Iterable[str] = ("sales_leads",),
+    ):
+        self.max_rows = max_rows
+        self.max_estimated_rows = max_estimated_rows
+        self.timeout = timeout
+        self.allowed_tables: Set[str] = {table.lower() for table in allowed_tables}
+
+    def check(self, cursor: duckdb.DuckDBPyConnection, sql: str) -> str:
+        """Validate a query and return it with its row limit applied
+
+        Raises UnsafeQueryError for anything other than a bounded read of the
+        allowed tables; DuckDB's own errors propagate for invalid SQL.
+        """
+        with span("sql_guard.check") as s:
+            statements = cursor.extract_statements(sql)
+            if len(statements) != 1:
+                raise UnsafeQueryError(f"Expected a single SQL statement, got {len(statements)}")
+            if statements[0].type != duckdb.StatementType.SELECT:
+                raise UnsafeQueryError(f"Only SELECT queries are allowed, got {statements[0].type.name}")
+
+            tree = json.loads(cursor.execute(f"SELECT json_serialize_sql({_literal(sql)})").fetchone()[0])
+            if tree.get("error"):
+                raise UnsafeQueryError(tree.get("error_message", "Could not parse the query"))
+            node = tree["statements"][0]["node"]
+            self._check_sources(node)
+
+            limited = self._apply_limit(node)
+            if limited:
+                sql = cursor.execute(f"SELECT json_deserialize_sql({_literal(json.dumps(tree))})").fetchone()[0]
+
+            estimate = self.estimate_rows(cursor, sql)
+            s.set(limited=limited, estimated_rows=estimate)
+            if estimate > self.max_estimated_rows:
+                raise UnsafeQueryError(
+                    f"Query plan is estimated to process {estimate:,} rows, "
+                    f"over the limit of {self.max_estimated_rows:,}"
+                )
+            return sql
+
+    def _check_sources(self, node: Dict[str, Any]):
+        """Refuse table functions and tables other than the allowed ones and CTEs"""
+        ctes = {
+            entry["key"].lower()
+            for item in _walk(node) if "cte_map" in item
+            for entry in item["cte_map"]["map"]
+        }
+        for item in _walk(node):
+            if item.get("type") == "TABLE_FUNCTION":
+                name = item.get("function", {}).get("function_name", "")
+                raise UnsafeQueryError(f"Table function {name}() is not allowed")
+            if item.get("type") == "BASE_TABLE":
+                table = item["table_name"].lower()
+                if item.get("schema_name") or item.get("catalog_name") or table not in self.allowed_tables | ctes:
+                    qualified = ".".join(filter(None, [item.get("catalog_name"), item.get("schema_name"), item["table_name"]]))
+                    raise UnsafeQueryError(f"Table {qualified} is not allowed")
+
+    def _apply_limit(self, node: Dict[str, Any]) -> bool:
+        """Cap the outermost query at max_rows + 1 rows, so truncation can be detected
+
+        Returns whether the query was changed.
+        """
+        cap = self.max_rows + 1
+        for modifier in node["modifiers"]:
+            if modifier["type"] != "LIMIT_MODIFIER":
+                continue
+            limit = modifier.get("limit") or {}
+            value = limit.get("value", {}).get("value") if limit.get("class") == "CONSTANT" else None
+            if isinstance(value, int) and value <= cap:
+                return False
+            modifier["limit"] = _limit_modifier(cap)["limit"]
+            return True
+        node["modifiers"].append(_limit_modifier(cap))
+        return True
+
+    @staticmethod
+    def estimate_rows(cursor: duckdb.DuckDBPyConnection, sql: str) -> int:
+        """The largest row count DuckDB's planner expects of any operator in the plan"""
+        plan = json.loads(cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}").fetchone()[1])
+        estimates = [
+            int(item["extra_info"]["Estimated Cardinality"])
+            for item in _walk(plan)
+            if isinstance(item.get("extra_info"), dict) and "Estimated Cardinality" in item["extra_info"]
+        ]
+        return max(estimates, default=0)
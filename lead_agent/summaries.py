@@ -0,0 +1,141 @@
+from typing import Callable, Dict, Optional, Tuple
+import threading
+import duckdb
+from agent_common.tracing import span
+
+class LeadSummaries:
+    """Lead counts and budget statistics, pre-aggregated by needs, month and quarter
+
+    Each summary table holds one row per group with the number of leads, how many
+    have a budget, and the total, average, smallest and largest budget. Analytic
+    questions answered from them read a few dozen rows instead of aggregating
+    every lead. lead_summary_meta records the highest lead ID aggregated; like the
+    search index, `update` only aggregates the leads past it and adds their counts
+    and totals onto the existing rows, since leads are append-only. Whoever
+    inserts leads calls `update` afterwards.
+    """
+    # Summary table -> (group column and its type, expression over the leads)
+    GROUPS: Dict[str, Tuple[str, str, str]] = {
+        "lead_summary_by_needs": ("needs", "VARCHAR", "needs"),
+        "lead_summary_by_month": ("created_month", "DATE", "date_trunc('month', created_at)::DATE"),
+        "lead_summary_by_quarter": ("start_quarter", "DATE", "date_trunc('quarter', timeline_start)::DATE"),
+    }
+    TABLES = (*GROUPS, "lead_summary_meta")
+
+    def __init__(self, cursor: Callable[[], duckdb.DuckDBPyConnection], source: str = "sales_leads"):
+        self.cursor = cursor
+        self.source = source
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        tables = self.cursor().execute(
+            f"SELECT count(*) FROM duckdb_tables() WHERE database_name = current_database() AND table_name IN {self.TABLES}"
+        ).fetchone()[0]
+        return tables == len(self.TABLES)
+
+    def last_id(self) -> Optional[int]:
+        """Highest lead ID aggregated, or None if there are no summaries"""
+        if not self.exists():
+            return None
+        return self.cursor().execute("SELECT last_id FROM lead_summary_meta").fetchone()[0]
+
+    def is_current(self) -> bool:
+        """Whether the summaries exist and cover every lead"""
+        last_id = self.last_id()
+        if last_id is None:
+            return False
+        return last_id == self.cursor().execute(f"SELECT coalesce(max(id), 0) FROM {self.source}").fetchone()[0]
+
+    def drop(self):
+        """Remove the summaries, e.g. when the leads they cover are replaced"""
+        with self._lock:
+            for table in self.TABLES:
+                self.cursor().execute(f"DROP TABLE IF EXISTS {table}")
+
+    def _create(self, cursor: duckdb.DuckDBPyConnection):
+        for table, (column, column_type, _) in self.GROUPS.items():
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    {column} {column_type}, leads BIGINT, budgeted_leads BIGINT,
+                    total_budget DOUBLE, avg_budget DOUBLE, min_budget DOUBLE, max_budget DOUBLE
+                )
+            """)
+        cursor.execute("CREATE TABLE IF NOT EXISTS lead_summary_meta (last_id BIGINT)")
+        if cursor.execute("SELECT count(*) FROM lead_summary_meta").fetchone()[0] == 0:
+            cursor.execute("INSERT INTO lead_summary_meta VALUES (0)")
+
+    def update(self) -> int:
+        """Add the leads inserted since the last update; returns how many were added"""
+        with self._lock, span("lead_summaries.update") as s:
+            cursor = self.cursor()
+            self._create(cursor)
+            last_id = cursor.execute("SELECT last_id FROM lead_summary_meta").fetchone()[0]
+            max_id = cursor.execute(f"SELECT coalesce(max(id), 0) FROM {self.source}").fetchone()[0]
+            # Fewer leads than were summarised means they were replaced
+            rebuild = max_id < last_id
+            if rebuild:
+                last_id = 0
+            elif max_id == last_id:
+                s.set(added=0)
+                return 0
+            cursor.execute("BEGIN TRANSACTION")
+            try:
+                if rebuild:
+                    for table in self.GROUPS:
+                        cursor.execute(f"DELETE FROM {table}")
+                added = self._add(cursor, last_id, max_id)
+                cursor.execute(f"UPDATE lead_summary_meta SET last_id = {int(max_id)}")
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            s.set(added=added, rebuilt=rebuild)
+            return added
+
+    def _add(self, cursor: duckdb.DuckDBPyConnection, after_id: int, max_id: int) -> int:
+        """Merge the leads with IDs in (after_id, max_id] into every summary table"""
+        leads = f"SELECT * FROM {self.source} WHERE id > {int(after_id)} AND id <= {int(max_id)}"
+        for table, (column, _, expression) in self.GROUPS.items():
+            cursor.execute(f"""
+                CREATE OR REPLACE TEMP TABLE lead_summary_new AS
+                SELECT {expression} AS {column}, count(*) AS leads, count(budget) AS budgeted_leads,
+                    coalesce(sum(budget), 0)::DOUBLE AS total_budget,
+                    min(budget)::DOUBLE AS min_budget, max(budget)::DOUBLE AS max_budget
+                FROM ({leads}) GROUP BY ALL
+            """)
+            # least and greatest skip NULLs, so groups without budgets keep NULL bounds
+            cursor.execute(f"""
+                UPDATE {table} SET
+                    leads = {table}.leads + new.leads,
+                    budgeted_leads = {table}.budgeted_leads + new.budgeted_leads,
+                    total_budget = {table}.total_budget + new.total_budget,
+                    min_budget = least({table}.min_budget, new.min_budget),
+                    max_budget = greatest({table}.max_budget, new.max_budget)
+                FROM lead_summary_new AS new
+                WHERE {table}.{column} IS NOT DISTINCT FROM new.{column}
+            """)
+            cursor.execute(f"""
+                INSERT INTO {table}
+                SELECT {column}, leads, budgeted_leads, total_budget, NULL, min_budget, max_budget
+                FROM lead_summary_new AS new
+                WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE t.{column} IS NOT DISTINCT FROM new.{column})
+            """)
+            cursor.execute(f"UPDATE {table} SET avg_budget = total_budget / nullif(budgeted_leads, 0)")
+        added = cursor.execute("SELECT coalesce(sum(leads), 0) FROM lead_summary_new").fetchone()[0]
+        cursor.execute("DROP TABLE lead_summary_new")
+        return added
+
+    def prompt(self) -> str:
+        """Describe the summary tables for the NL->SQL prompt"""
+        tables = "".join(
+            f"\n- {table}({column}, leads, budgeted_leads, total_budget, avg_budget, min_budget, max_budget)"
+            for table, (column, _, _) in self.GROUPS.items()
+        )
+        return f"""
+
+Summary tables, kept up to date with sales_leads, hold one row per group:{tables}
+created_month is the first day of the month the leads were created in, start_quarter the first day of the quarter
+their timeline starts in. leads counts every lead, budgeted_leads those with a budget; total_budget, avg_budget,
+min_budget and max_budget are over the budgeted leads. For counts or budget statistics grouped by needs, created
+month or timeline start quarter, optionally filtered on that same column, query these tables instead of sales_leads.
+To combine groups, add up leads and total_budget and divide; never average avg_budget."""
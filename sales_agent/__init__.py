@@ -0,0 +1,15 @@
+from typing import TYPE_CHECKING
+from agent_common.lazy import lazy_exports
+
+__all__ = ["SalesAgent", "create_graph", "run_async", "CostBreakdown", "CostingEngine"]
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "SalesAgent": "sales_agent.sales_agent",
+    "create_graph": "sales_agent.sales_agent",
+    "run_async": "sales_agent.sales_agent",
+    "CostBreakdown": "sales_agent.costing",
+    "CostingEngine": "sales_agent.costing",
+})
+
+if TYPE_CHECKING:
+    from sales_agent.costing import CostBreakdown, CostingEngine
+    from sales_agent.sales_agent import SalesAgent, create_graph, run_async
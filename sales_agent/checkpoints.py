@@ -0,0 +1,71 @@
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Tuple
+import asyncio
+import os
+import sqlite3
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+DEFAULT_PATH = "sales_agent/checkpoints.db"
+
+def default_checkpoint_path() -> str:
+    """Resolve the checkpoint database location from PROPOSAL_CHECKPOINT_PATH"""
+    return os.getenv("PROPOSAL_CHECKPOINT_PATH", DEFAULT_PATH)
+
+class ProposalCheckpointer(SqliteSaver):
+    """SQLite checkpointer that serves both synchronous and asynchronous graph runs
+
+    LangGraph saves a checkpoint after every node, so a proposal that fails or is
+    interrupted resumes from its last completed node. SqliteSaver refuses async
+    calls and AsyncSqliteSaver must be created inside a running event loop, so this
+    runs SqliteSaver's (locked, quick) queries in a worker thread for async callers.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        conn = sqlite3.connect(path or default_checkpoint_path(), check_same_thread=False)
+        super().__init__(conn)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        checkpoints = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint in checkpoints:
+            yield checkpoint
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ):
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str):
+        """Forget a finished run, so the database only holds runs that can be resumed"""
+        self.setup()
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", [thread_id])
+            self.conn.execute("DELETE FROM writes WHERE thread_id = ?", [thread_id])
+
+    async def adelete_thread(self, thread_id: str):
+        await asyncio.to_thread(self.delete_thread, thread_id)
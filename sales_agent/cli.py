@@ -1,12 +1,21 @@
+import sys
+from pathlib import Path
 import typer
 from rich.console import Console
 from rich.panel import Panel
 from rich.markdown import Markdown
 from rich.prompt import Prompt
 from rich.theme import Theme
+from rich.live import Live
+from rich.spinner import Spinner
 from rich.table import Table
-from sales_agent import create_graph, SalesAgent
-from langchain_core.messages import HumanMessage
+from typing import List, Optional
+# Make the agent packages importable when run as a script, e.g. `uv run sales_agent/cli.py`
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# The package loads its agent, and with it langchain, on first attribute access
+import sales_agent
+from agent_common.profiling import profiled
+from agent_common.tracing import configure_from_env
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -22,6 +31,17 @@ console = Console(theme=Theme({
 
 app = typer.Typer(help="Proposal Agent - Generate professional sales proposals")
 
+@app.callback()
+def main(
+    ctx: typer.Context,
+    profile: bool = typer.Option(False, "--profile", help="Print a per-stage timing breakdown after the command"),
+):
+    """Configure tracing for every command"""
+    # Set AGENT_TRACE_FILE to also export every span as JSONL
+    configure_from_env()
+    if profile:
+        ctx.with_resource(profiled(console, f"sales_agent.{ctx.invoked_subcommand}"))
+
 def display_welcome():
     welcome_md = """
     # 📄 Proposal Agent
@@ -36,25 +56,47 @@ def display_welcome():
     """
     console.print(Panel(Markdown(welcome_md), title="Welcome", border_style="blue"))
 
-def handle_list_leads():
+_agent = None
+
+def get_agent() -> "sales_agent.SalesAgent":
+    """Return the agent shared by every command in this process"""
+    global _agent
+    if _agent is None:
+        _agent = sales_agent.SalesAgent()
+    return _agent
+
+def handle_list_leads(page: int = 1):
     """Display all available leads"""
-    agent = SalesAgent()
+    agent = get_agent()
     with console.status("[bold blue]Fetching leads...[/bold blue]"):
-        leads = agent.list_leads()
+        leads = agent.list_leads(page)
     console.print(Panel(Markdown(leads), title="Available Leads", border_style="cyan"))
 
-def handle_search_leads(search_term: str):
+def handle_search_leads(search_term: str, page: int = 1):
     """Search for leads matching the search term"""
-    agent = SalesAgent()
+    agent = get_agent()
     with console.status(f"[bold blue]Searching leads for '{search_term}'...[/bold blue]"):
-        results = agent.search_leads(search_term)
+        results = agent.search_leads(search_term, page)
     console.print(Panel(Markdown(results), title="Search Results", border_style="cyan"))
 
+async def astream_response(workflow, query: str, status: str, title: str) -> str:
+    """Render the response live as tokens stream from the workflow"""
+    from langchain_core.messages import HumanMessage
+    from sales_agent.workflow import astream_proposal, thread_id_for
+    response = ""
+    state = {"messages": [HumanMessage(content=query)]}
+    with Live(Spinner("dots", text=status), console=console, refresh_per_second=12) as live:
+        async for chunk in astream_proposal(workflow, state, thread_id_for(query)):
+            response += chunk
+            live.update(Panel(Markdown(response), title=title, border_style="green"))
+        live.update(Panel(Markdown(response), title=title, border_style="green"))
+    return response
+
 @app.command()
 def interactive():
     """Start an interactive session with the Proposal Agent"""
     display_welcome()
-    workflow = create_graph()
+    workflow = sales_agent.create_graph(get_agent())
     
     while True:
         try:
@@ -75,43 +117,64 @@ def interactive():
                 
             elif command == "gen":
                 lead_id = Prompt.ask("[blue]Enter lead ID[/blue]")
-                with console.status("[bold blue]Generating proposal...[/bold blue]"):
-                    state = {"messages": [HumanMessage(content=f"Generate a proposal for lead {lead_id}")]}
-                    final_state = workflow.invoke(state)
-                    response = final_state["messages"][-1].content
-                console.print(Panel(Markdown(response), title="Generated Proposal", border_style="green"))
+                query = f"Generate a proposal for lead {lead_id}"
+                sales_agent.run_async(astream_response(workflow, query, "[bold blue]Generating proposal...[/bold blue]", "Generated Proposal"))
             
         except Exception as e:
             console.print(f"[error]Error: {str(e)}[/error]")
             console.print("[warning]Please try again.[/warning]")
 
 @app.command()
-def list_leads():
+def list_leads(page: int = typer.Option(1, "--page", min=1, help="Page of results to show")):
     """Display all available leads"""
-    handle_list_leads()
+    handle_list_leads(page)
 
 @app.command()
-def search(term: str):
-    """Search for leads by company name or needs"""
-    handle_search_leads(term)
+def search(term: str, page: int = typer.Option(1, "--page", min=1, help="Page of results to show")):
+    """Search for leads by company name, customer name or needs"""
+    handle_search_leads(term, page)
 
 @app.command()
 def generate(lead_id: str):
     """Generate a proposal for a specific lead"""
-    workflow = create_graph()
+    workflow = sales_agent.create_graph(get_agent())
     
     try:
-        with console.status("[bold blue]Generating proposal...[/bold blue]"):
-            query = f"Generate a proposal for lead {lead_id}"
-            state = {"messages": [HumanMessage(content=query)]}
-            final_state = workflow.invoke(state)
-            response = final_state["messages"][-1].content
-        
-        console.print(Panel(Markdown(response), title="Generated Proposal", border_style="green"))
+        query = f"Generate a proposal for lead {lead_id}"
+        sales_agent.run_async(astream_response(workflow, query, "[bold blue]Generating proposal...[/bold blue]", "Generated Proposal"))
         
     except Exception as e:
         console.print(f"[error]Error: {str(e)}[/error]")
         raise typer.Exit(code=1)
 
+@app.command("generate-batch")
+def generate_batch(
+    lead_ids: Optional[List[str]] = typer.Argument(None, help="Lead IDs to generate proposals for"),
+    all_leads: bool = typer.Option(False, "--all", help="Generate proposals for every lead in the database"),
+    output_dir: str = typer.Option("proposals", "--output-dir", "-o", help="Directory to write proposals to"),
+    concurrency: int = typer.Option(4, "--concurrency", "-c", min=1, help="Maximum number of in-flight LLM requests"),
+):
+    """Generate proposals for many leads in one run"""
+    agent = get_agent()
+    if all_leads:
+        lead_ids = agent.lead_agent.list_lead_ids()
+    if not lead_ids:
+        console.print("[error]Error: pass one or more lead IDs or --all[/error]")
+        raise typer.Exit(code=1)
+    
+    def report(lead_id: str, result):
+        if isinstance(result, Exception):
+            console.print(f"[error]Lead {lead_id}: {str(result)}[/error]")
+        else:
+            console.print(f"[success]Lead {lead_id}: wrote {result}[/success]")
+    
+    with console.status(f"[bold blue]Generating {len(lead_ids)} proposals...[/bold blue]"):
+        results = agent.generate_many(lead_ids, output_dir, concurrency, on_complete=report)
+    
+    failed = [lead_id for lead_id, result in results.items() if isinstance(result, Exception)]
+    console.print(f"\n[info]Generated {len(results) - len(failed)} of {len(results)} proposals in {output_dir}[/info]")
+    if failed:
+        raise typer.Exit(code=1)
+
 if __name__ == "__main__":
     app() 
\ No newline at end of file
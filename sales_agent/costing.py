@@ -0,0 +1,95 @@
+from typing import Dict, List, NamedTuple, Sequence
+import numpy as np
+from pydantic import BaseModel
+from sales_engineer_agent.sales_engineer_agent import EffortEstimate
+
+class CostLine(NamedTuple):
+    phase: str
+    role: str
+    days: float
+    rate: float
+    cost: float
+
+class CostBreakdown(BaseModel):
+    lines: List[CostLine]
+    by_role: Dict[str, float]
+    total: float
+
+    def to_markdown(self) -> str:
+        """Render the breakdown as an itemised table followed by the totals"""
+        lines = ["| Phase | Role | Days | Daily rate | Cost |", "|---|---|---|---|---|"]
+        lines.extend(
+            f"| {line.phase} | {line.role} | {line.days:g} | ${line.rate:,.0f} | ${line.cost:,.2f} |"
+            for line in self.lines
+        )
+        lines.append("")
+        lines.extend(f"- {role}: ${cost:,.2f}" for role, cost in self.by_role.items())
+        lines.append(f"\n**Total project cost:** ${self.total:,.2f}")
+        return "\n".join(lines)
+
+    def to_brief(self) -> str:
+        """Cost per phase and per role and the total, for passing between agents"""
+        by_phase: Dict[str, float] = {}
+        for line in self.lines:
+            by_phase[line.phase] = by_phase.get(line.phase, 0.0) + line.cost
+        return "\n".join([
+            "By phase: " + ", ".join(f"{phase} ${cost:,.0f}" for phase, cost in by_phase.items()),
+            "By role: " + ", ".join(f"{role} ${cost:,.0f}" for role, cost in self.by_role.items()),
+            f"Total: ${self.total:,.2f}",
+        ])
+
+class CostingEngine:
+    """Price effort estimates against a table of daily rates
+
+    Every staffing line of every estimate is flattened into NumPy arrays and priced
+    in one pass, so costing a batch of thousands of estimates takes milliseconds.
+    """
+
+    def __init__(self, pay_scale: Dict[str, float]):
+        self.roles = list(pay_scale)
+        self.rates = np.array([pay_scale[role] for role in self.roles], dtype=float)
+        self._role_index = {role: i for i, role in enumerate(self.roles)}
+
+    def price(self, estimate: EffortEstimate) -> CostBreakdown:
+        """Price a single estimate"""
+        return self.price_many([estimate])[0]
+
+    def price_many(self, estimates: Sequence[EffortEstimate]) -> List[CostBreakdown]:
+        """Price a batch of estimates at once"""
+        owners, phases, roles, days = [], [], [], []
+        for i, estimate in enumerate(estimates):
+            for phase in estimate.phases:
+                for staffing in phase.staffing:
+                    if staffing.role not in self._role_index:
+                        raise ValueError(f"No daily rate for role {staffing.role!r}")
+                    owners.append(i)
+                    phases.append(phase.name)
+                    roles.append(self._role_index[staffing.role])
+                    days.append(staffing.days)
+
+        owners = np.array(owners, dtype=int)
+        roles = np.array(roles, dtype=int)
+        days = np.array(days, dtype=float)
+        rates = self.rates[roles]
+        costs = np.round(days * rates, 2)
+
+        # Days per (estimate, role), so role subtotals and totals need no per-line loop
+        role_days = np.zeros((len(estimates), len(self.roles)))
+        np.add.at(role_days, (owners, roles), days)
+        role_costs = np.round(role_days * self.rates, 2)
+        totals = role_costs.sum(axis=1)
+
+        # Convert to Python scalars once; the values are already validated, so the
+        # breakdowns are constructed without validating them again
+        phase_names, role_names = phases, [self.roles[r] for r in roles.tolist()]
+        days, rates, costs = days.tolist(), rates.tolist(), costs.tolist()
+        breakdowns = []
+        bounds = np.searchsorted(owners, np.arange(len(estimates) + 1)).tolist()
+        for i in range(len(estimates)):
+            lines = [
+                CostLine(phase_names[j], role_names[j], days[j], rates[j], costs[j])
+                for j in range(bounds[i], bounds[i + 1])
+            ]
+            by_role = {self.roles[r]: float(role_costs[i, r]) for r in np.flatnonzero(role_days[i])}
+            breakdowns.append(CostBreakdown.model_construct(lines=lines, by_role=by_role, total=float(totals[i])))
+        return breakdowns
@@ -1,12 +1,80 @@
-from typing import Dict, Any, Optional
-from langgraph.graph import Graph
-import os
-from langchain_core.messages import HumanMessage, AIMessage
-from langchain_openai import ChatOpenAI
-from lead_agent.lead_agent import LeadAgent
-from sales_engineer_agent.sales_engineer_agent import SalesEngineerAgent
+from __future__ import annotations
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Callable, Iterable, Iterator, AsyncIterator, Sequence, Tuple
+from functools import cached_property
+from pathlib import Path
+import asyncio
+import re
+from agent_common.prompts import get_prompt
+from agent_common.tokens import outline, token_ledger
+from agent_common.tracing import traced
+from lead_agent.lead_agent import Lead, LeadAgent
+from sales_engineer_agent.sales_engineer_agent import EffortEstimate, SalesEngineerAgent
+
+if TYPE_CHECKING:
+    from langchain_core.runnables import Runnable
+    from langgraph.graph.state import CompiledStateGraph
+    from sales_agent.costing import CostBreakdown, CostingEngine
+
+_runner: Optional[asyncio.Runner] = None
+
+def run_async(coro):
+    """Run a coroutine to completion on a process-wide event loop
+    
+    The chat clients' async HTTP connection pools are bound to the loop they were
+    first used on, so synchronous callers must share one loop rather than calling
+    asyncio.run repeatedly.
+    """
+    global _runner
+    if _runner is None:
+        _runner = asyncio.Runner()
+    return _runner.run(coro)
+
+# Phrasings like "lead 7", "lead id: 7", "lead #7" or a bare "#7"
+LEAD_ID_PATTERN = re.compile(r"\blead\s*(?:id)?\s*(?:#|no\.?|number)?\s*:?\s*(\d+)\b|#\s*(\d+)\b", re.IGNORECASE)
+# A request that is nothing but the ID, e.g. "42"
+BARE_LEAD_ID_PATTERN = re.compile(r"^\s*#?(\d+)\s*$")
+
+def match_lead_id(text: str) -> Optional[str]:
+    """Find a lead ID in free text without calling the LLM
+
+    Other numbers in a request, e.g. "the lead with a 50000 budget", are not
+    taken for IDs; requests without a recognisable ID go to the LLM.
+    """
+    match = LEAD_ID_PATTERN.search(text) or BARE_LEAD_ID_PATTERN.match(text)
+    if match:
+        return next(group for group in match.groups() if group)
+    return None
+
+class ConcurrencyLimitedLLM:
+    """Chat model wrapper that caps the number of in-flight async requests
+    
+    A streamed response holds its slot until the last chunk has arrived.
+    """
+    
+    def __init__(self, llm: Any, semaphore: asyncio.Semaphore):
+        self.llm = llm
+        self.semaphore = semaphore
+    
+    async def ainvoke(self, *args, **kwargs):
+        async with self.semaphore:
+            return await self.llm.ainvoke(*args, **kwargs)
+    
+    async def astream(self, *args, **kwargs):
+        async with self.semaphore:
+            async for chunk in self.llm.astream(*args, **kwargs):
+                yield chunk
+    
+    def __getattr__(self, name: str):
+        return getattr(self.llm, name)
 
 class SalesAgent:
+    # Most tokens each section of the proposal prompt may take
+    PROMPT_BUDGETS = {
+        "proposal.lead": 150,
+        "proposal.plan": 800,
+        "proposal.estimate": 400,
+        "proposal.costs": 300,
+    }
     # Pay scale for different roles (daily rates)
     PAY_SCALE = {
         "Junior Engineer": 400,
@@ -18,125 +86,287 @@ class SalesAgent:
     }
     
     def __init__(self):
-        self.llm = ChatOpenAI(
-            model=os.getenv("OPENAI_MODEL"),
-            base_url=os.getenv("OPENAI_BASE_URL"),
-            api_key=os.getenv("OPENAI_API_KEY"),
-        )
         self.lead_agent = LeadAgent()
         self.sales_engineer = SalesEngineerAgent()
+
+    @cached_property
+    def llm(self) -> Runnable:
+        """Chat model for proposals, created on first use so commands that never call it skip loading langchain"""
+        from agent_common.llm import chat_model
+        return chat_model("proposal")
+
+    @cached_property
+    def extraction_llm(self) -> Runnable:
+        """Fast chat model for pulling the lead ID out of a request, created on first use"""
+        from agent_common.llm import chat_model
+        return chat_model("extraction")
+
+    @cached_property
+    def costing(self) -> CostingEngine:
+        """Costing engine for the pay scale, created on first use"""
+        from sales_agent.costing import CostingEngine
+        return CostingEngine(self.PAY_SCALE)
+
+    @cached_property
+    def proposal_graph(self) -> CompiledStateGraph:
+        """Checkpointed proposal workflow that every proposal entry point runs through, built on first use"""
+        return create_graph(self)
         
+    @traced("sales.get_lead")
+    def get_lead(self, lead_id: str) -> Lead:
+        """Fetch a lead from the lead agent"""
+        lead = self.lead_agent.get_lead(int(lead_id))
+        if lead is None:
+            raise ValueError(f"Lead {lead_id} not found")
+        return lead
+
+    @traced("sales.get_lead")
+    async def aget_lead(self, lead_id: str) -> Lead:
+        """Fetch a lead from the lead agent without blocking the event loop"""
+        lead = await self.lead_agent.aget_lead(int(lead_id))
+        if lead is None:
+            raise ValueError(f"Lead {lead_id} not found")
+        return lead
+
     def get_lead_details(self, lead_id: str) -> str:
         """Fetch lead details from the lead agent"""
-        query = f"Give me all details for lead with id {lead_id}"
-        return self.lead_agent.run(query)
-        
-    def generate_technical_specs(self, requirements: str) -> str:
-        """Get technical specifications and estimates from sales engineer"""
-        return self.sales_engineer.run(requirements)
-        
-    def calculate_costs(self, technical_specs: str) -> str:
-        """Calculate costs based on technical specifications and pay scale"""
-        prompt = f"""Based on these technical specifications, determine the team composition needed
-        and calculate the total cost. Use these daily rates:
-        
-        - Junior Engineer: $400/day
-        - Senior Engineer: $800/day
-        - Tech Lead: $1200/day
-        - Project Manager: $1000/day
-        - DevOps Engineer: $900/day
-        - QA Engineer: $600/day
+        return self.get_lead(lead_id).to_markdown()
+
+    async def aget_lead_details(self, lead_id: str) -> str:
+        """Fetch lead details from the lead agent without blocking the event loop"""
+        return (await self.aget_lead(lead_id)).to_markdown()
+
+    @staticmethod
+    def requirements_for(lead: Lead) -> str:
+        """Requirements to hand the sales engineer for a lead
         
-        Technical Specifications:
-        {technical_specs}
+        Leads fall into a small set of need categories, so planning per category
+        rather than per lead lets the sales engineer's estimate cache answer almost
+        every proposal.
+        """
+        return lead.needs or lead.to_markdown()
         
-        Provide a detailed cost breakdown including:
-        1. Required team members and duration
-        2. Cost calculation for each role
-        3. Total project cost
+    def generate_technical_specs(self, requirements: str) -> Tuple[str, EffortEstimate]:
+        """Get technical specifications and the effort estimate from sales engineer"""
+        project_plan, estimate = self.sales_engineer.plan_and_estimate(requirements)
+        return self.sales_engineer.combine(project_plan, estimate), estimate
+
+    async def agenerate_technical_specs(self, requirements: str) -> Tuple[str, EffortEstimate]:
+        """Get technical specifications without blocking the event loop"""
+        project_plan, estimate = await self.sales_engineer.aplan_and_estimate(requirements)
+        return self.sales_engineer.combine(project_plan, estimate), estimate
         
-        Format as a clear, itemized breakdown."""
+    def _proposal_messages(self, lead: Lead, project_plan: str, estimate: EffortEstimate, costs: CostBreakdown) -> List[tuple]:
+        """Build the messages for the final proposal document
         
-        messages = [HumanMessage(content=prompt)]
-        return self.llm.invoke(messages).content
+        Each section is sent as compact structured fields rather than the other
+        agents' full markdown, and cut down further only if it is over its budget
+        in PROMPT_BUDGETS; the tokens saved are recorded in the token ledger.
+        """
+        def section(stage: str, full: str, compact: str) -> str:
+            return token_ledger.compact(stage, full, compact, self.PROMPT_BUDGETS.get(stage))
+
+        rate_card = ", ".join(f"{role} ${rate:,}" for role, rate in self.PAY_SCALE.items())
+        return get_prompt("sales.proposal").messages(
+            {"rate_card": rate_card},
+            lead_details=section("proposal.lead", lead.to_markdown(), lead.to_brief()),
+            plan=section("proposal.plan", project_plan, outline(project_plan)),
+            effort=section("proposal.estimate", estimate.to_markdown(), estimate.to_brief()),
+            costs=section("proposal.costs", costs.to_markdown(), costs.to_brief()),
+        )
+
+    @traced("sales.calculate_costs")
+    def calculate_costs(self, estimate: EffortEstimate) -> CostBreakdown:
+        """Price the effort estimate against the pay scale"""
+        return self.costing.price(estimate)
+
+    @traced("sales.calculate_costs")
+    def calculate_costs_many(self, estimates: Sequence[EffortEstimate]) -> List[CostBreakdown]:
+        """Price many effort estimates in one pass"""
+        return self.costing.price_many(estimates)
         
-    def generate_proposal(self, technical_specs: str, lead_details: str, costs: str) -> str:
+    @traced("sales.generate_proposal")
+    def generate_proposal(self, lead: Lead, project_plan: str, estimate: EffortEstimate, costs: CostBreakdown) -> str:
         """Generate the final proposal document"""
-        prompt = f"""Create a professional proposal document with the following information:
-        
-        Lead Details:
-        {lead_details}
-        
-        Technical Specifications:
-        {technical_specs}
-        
-        Cost Breakdown:
-        {costs}
+        messages = self._proposal_messages(lead, project_plan, estimate, costs)
+        return self.llm.invoke(messages).content
+
+    @traced("sales.generate_proposal")
+    async def agenerate_proposal(self, lead: Lead, project_plan: str, estimate: EffortEstimate, costs: CostBreakdown) -> str:
+        """Generate the final proposal document without blocking the event loop"""
+        messages = self._proposal_messages(lead, project_plan, estimate, costs)
+        response = await self.llm.ainvoke(messages)
+        return response.content
+
+    @traced("sales.generate_proposal")
+    def stream_proposal(self, lead: Lead, project_plan: str, estimate: EffortEstimate, costs: CostBreakdown) -> Iterator[str]:
+        """Stream the final proposal document token by token"""
+        messages = self._proposal_messages(lead, project_plan, estimate, costs)
+        for chunk in self.llm.stream(messages):
+            yield chunk.content
+
+    @traced("sales.generate_proposal")
+    async def astream_proposal(self, lead: Lead, project_plan: str, estimate: EffortEstimate, costs: CostBreakdown) -> AsyncIterator[str]:
+        """Stream the final proposal document without blocking the event loop"""
+        messages = self._proposal_messages(lead, project_plan, estimate, costs)
+        async for chunk in self.llm.astream(messages):
+            yield chunk.content
+
+    @staticmethod
+    def _parse_llm_lead_id(response: str, query: str) -> str:
+        """Pull the numeric ID out of the LLM's answer"""
+        match = re.search(r"\d+", response)
+        if not match:
+            raise ValueError(f"Could not find a lead ID in query: {query}")
+        return match.group(0)
+
+    @traced("sales.extract_lead_id")
+    def extract_lead_id(self, query: str) -> str:
+        """Extract the lead ID from a proposal request, using the LLM only as a fallback"""
+        lead_id = match_lead_id(query)
+        if lead_id is not None:
+            return lead_id
+        messages = get_prompt("sales.extract_lead_id").messages({}, query=query)
+        return self._parse_llm_lead_id(self.extraction_llm.invoke(messages).content, query)
+
+    @traced("sales.extract_lead_id")
+    async def aextract_lead_id(self, query: str) -> str:
+        """Extract the lead ID from a proposal request without blocking the event loop"""
+        lead_id = match_lead_id(query)
+        if lead_id is not None:
+            return lead_id
+        messages = get_prompt("sales.extract_lead_id").messages({}, query=query)
+        response = await self.extraction_llm.ainvoke(messages)
+        return self._parse_llm_lead_id(response.content, query)
         
-        Format the proposal with these sections:
-        1. Executive Summary
-        2. Project Understanding
-        3. Proposed Solution
-        4. Implementation Approach
-        5. Timeline
-        6. Team Composition
-        7. Investment
-        8. Terms and Conditions
+    @traced("sales.run")
+    def run(self, query: str) -> str:
+        """Process a proposal request
         
-        Make it professional and persuasive. Use markdown formatting."""
+        Runs through the checkpointed workflow, so a request that failed part way
+        resumes from its last completed stage.
+        """
+        from langchain_core.messages import HumanMessage
+        from sales_agent.workflow import run_proposal, thread_id_for
+        state = {"messages": [HumanMessage(content=query)]}
+        return run_proposal(self.proposal_graph, state, thread_id_for(query))
+
+    @traced("sales.run")
+    def stream(self, query: str) -> Iterator[str]:
+        """Process a proposal request, streaming the final proposal through the checkpointed workflow"""
+        from langchain_core.messages import HumanMessage
+        from sales_agent.workflow import stream_proposal, thread_id_for
+        state = {"messages": [HumanMessage(content=query)]}
+        yield from stream_proposal(self.proposal_graph, state, thread_id_for(query))
+
+    @traced("sales.run")
+    async def astream(self, query: str) -> AsyncIterator[str]:
+        """Process a proposal request, streaming the final proposal asynchronously
         
-        messages = [HumanMessage(content=prompt)]
-        return self.llm.invoke(messages).content
+        Runs through the checkpointed workflow, so a request that failed part way
+        resumes from its last completed stage.
+        """
+        from langchain_core.messages import HumanMessage
+        from sales_agent.workflow import astream_proposal, thread_id_for
+        state = {"messages": [HumanMessage(content=query)]}
+        async for chunk in astream_proposal(self.proposal_graph, state, thread_id_for(query)):
+            yield chunk
+
+    @traced("sales.run")
+    async def arun(self, query: str) -> str:
+        """Process a proposal request without blocking the event loop"""
+        lead_id = await self.aextract_lead_id(query)
+        return await self.agenerate_for_lead(lead_id)
+
+    @traced("sales.generate_for_lead")
+    async def agenerate_for_lead(self, lead_id: str) -> str:
+        """Generate a proposal for a known lead ID, resuming an earlier failed attempt"""
+        from sales_agent.workflow import arun_proposal
+        state = {"lead_id": str(lead_id), "messages": []}
+        return await arun_proposal(self.proposal_graph, state, f"proposal-lead-{lead_id}")
+
+    async def agenerate_many(
+        self,
+        lead_ids: Iterable[str],
+        output_dir: str = "proposals",
+        max_concurrency: int = 4,
+        on_complete: Optional[Callable[[str, Any], None]] = None,
+    ) -> Dict[str, Any]:
+        """Generate proposals for many leads, writing each to disk as soon as it is ready
         
-    def run(self, query: str) -> str:
-        """Process a proposal request"""
-        # Extract lead ID from query
-        prompt = f"Extract the lead ID from this query: {query}"
-        messages = [HumanMessage(content=prompt)]
-        lead_id = self.llm.invoke(messages).content.strip()
+        At most `max_concurrency` LLM requests are in flight at any time across all
+        three agents. Returns a mapping of lead ID to the written file path, or to the
+        exception that stopped that lead.
+        """
+        out = Path(output_dir)
+        out.mkdir(parents=True, exist_ok=True)
         
-        # Get lead details
-        lead_details = self.get_lead_details(lead_id)
+        semaphore = asyncio.Semaphore(max_concurrency)
+        models = (
+            (self, "llm"),
+            (self, "extraction_llm"),
+            (self.lead_agent, "llm"),
+            (self.sales_engineer, "llm"),
+            (self.sales_engineer, "estimate_llm"),
+        )
+        original_llms = [getattr(agent, name) for agent, name in models]
+        for agent, name in models:
+            setattr(agent, name, ConcurrencyLimitedLLM(getattr(agent, name), semaphore))
         
-        # Generate technical specifications
-        technical_specs = self.generate_technical_specs(lead_details)
+        results: Dict[str, Any] = {}
+        pending = iter(lead_ids)
         
-        # Calculate costs
-        costs = self.calculate_costs(technical_specs)
+        async def worker():
+            # Workers pull from a shared iterator so each lead finishes as early as possible
+            for lead_id in pending:
+                lead_id = str(lead_id)
+                try:
+                    proposal = await self.agenerate_for_lead(lead_id)
+                    path = out / f"proposal_{lead_id}.md"
+                    path.write_text(proposal)
+                    results[lead_id] = path
+                except Exception as e:
+                    results[lead_id] = e
+                if on_complete:
+                    on_complete(lead_id, results[lead_id])
         
-        # Generate final proposal
-        proposal = self.generate_proposal(technical_specs, lead_details, costs)
+        try:
+            await asyncio.gather(*(worker() for _ in range(max_concurrency)))
+        finally:
+            for (agent, name), llm in zip(models, original_llms):
+                setattr(agent, name, llm)
         
-        return proposal
+        return results
+
+    def generate_many(
+        self,
+        lead_ids: Iterable[str],
+        output_dir: str = "proposals",
+        max_concurrency: int = 4,
+        on_complete: Optional[Callable[[str, Any], None]] = None,
+    ) -> Dict[str, Any]:
+        """Generate proposals for many leads with bounded concurrency"""
+        return run_async(self.agenerate_many(lead_ids, output_dir, max_concurrency, on_complete))
 
-    def list_leads(self) -> str:
+    @traced("sales.list_leads")
+    def list_leads(self, page: int = 1) -> str:
         """Get a formatted list of all leads"""
-        query = """List all leads showing their IDs, company names, and needs.
-        Format each lead on a new line starting with the ID."""
-        result = self.lead_agent.run(query)
-        return result
+        return self.lead_agent.list_leads(page)
     
-    def search_leads(self, search_term: str) -> str:
-        """Search leads by company name or needs"""
-        query = f"""Find leads where company name or needs contain '{search_term}'.
-        Show the ID, company name, and needs for each match.
-        Format each lead on a new line starting with the ID."""
-        result = self.lead_agent.run(query)
-        return result
-
-def create_graph() -> Graph:
-    """Create the langgraph workflow"""
-    sales_agent = SalesAgent()
-    
-    def process_message(state: Dict[str, Any]):
-        query = state["messages"][-1].content
-        response = sales_agent.run(query)
-        state["messages"].append(AIMessage(content=response))
-        return state
-    
-    workflow = Graph()
-    workflow.add_node("process_message", process_message)
-    workflow.set_entry_point("process_message")
-    workflow.set_finish_point("process_message")
+    @traced("sales.search_leads")
+    def search_leads(self, search_term: str, page: int = 1) -> str:
+        """Search leads by company name, customer name or needs, without the LLM"""
+        return self.lead_agent.search_leads(search_term, page)
+
+def create_graph(sales_agent: Optional[SalesAgent] = None, checkpoint_path: Optional[str] = None, checkpoints: bool = True) -> CompiledStateGraph:
+    """Create the langgraph workflow
     
-    return workflow.compile() 
\ No newline at end of file
+    One node per proposal stage, checkpointed to SQLite (PROPOSAL_CHECKPOINT_PATH)
+    after each, unless `checkpoints` is False; see sales_agent.workflow.
+    """
+    # Imported here so that commands which never build a graph skip loading langgraph
+    from sales_agent.checkpoints import ProposalCheckpointer
+    from sales_agent.workflow import create_proposal_graph
+    sales_agent = sales_agent or SalesAgent()
+    checkpointer = ProposalCheckpointer(checkpoint_path) if checkpoints else None
+    return create_proposal_graph(sales_agent, checkpointer)
@@ -0,0 +1,194 @@
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, TypedDict
+import asyncio
+import hashlib
+import threading
+import weakref
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.state import CompiledStateGraph
+from langgraph.types import StreamWriter
+from langgraph.utils.runnable import RunnableCallable
+from agent_common.tracing import span
+from lead_agent.lead_agent import Lead
+from sales_agent.checkpoints import ProposalCheckpointer
+from sales_agent.costing import CostBreakdown
+from sales_agent.sales_agent import SalesAgent, match_lead_id
+from sales_engineer_agent.sales_engineer_agent import EffortEstimate
+
+class ProposalState(TypedDict, total=False):
+    """What the proposal workflow knows so far; each node adds its own result"""
+    messages: List[Any]
+    lead_id: str
+    lead: Lead
+    project_plan: str
+    effort_estimate: EffortEstimate
+    costs: CostBreakdown
+    proposal: str
+
+def thread_id_for(request: str) -> str:
+    """Checkpoint thread for a proposal request; requests naming the same lead share one"""
+    lead_id = match_lead_id(request)
+    if lead_id is not None:
+        return f"proposal-lead-{lead_id}"
+    return "proposal-" + hashlib.sha256(request.encode()).hexdigest()[:16]
+
+def create_proposal_graph(sales_agent: SalesAgent, checkpointer: Optional[ProposalCheckpointer] = None) -> CompiledStateGraph:
+    """Build the proposal workflow, one node per stage
+
+    Each stage needs the one before it, so a single proposal runs as a chain;
+    proposals for different leads fan out as separate runs (see
+    SalesAgent.agenerate_many). With a checkpointer, runs must be given a thread
+    ID, and a run that fails or is interrupted resumes from its last completed
+    node; see astream_proposal.
+    """
+    engineer = sales_agent.sales_engineer
+
+    def request(state: ProposalState) -> str:
+        return state["messages"][-1].content
+
+    def extract_id(state: ProposalState) -> Dict[str, Any]:
+        if state.get("lead_id"):
+            return {}
+        return {"lead_id": sales_agent.extract_lead_id(request(state))}
+
+    async def aextract_id(state: ProposalState) -> Dict[str, Any]:
+        if state.get("lead_id"):
+            return {}
+        return {"lead_id": await sales_agent.aextract_lead_id(request(state))}
+
+    def fetch_lead(state: ProposalState) -> Dict[str, Any]:
+        return {"lead": sales_agent.get_lead(state["lead_id"])}
+
+    async def afetch_lead(state: ProposalState) -> Dict[str, Any]:
+        return {"lead": await sales_agent.aget_lead(state["lead_id"])}
+
+    def analyze(state: ProposalState) -> Dict[str, Any]:
+        return {"project_plan": engineer.get_plan(sales_agent.requirements_for(state["lead"]))}
+
+    async def aanalyze(state: ProposalState) -> Dict[str, Any]:
+        return {"project_plan": await engineer.aget_plan(sales_agent.requirements_for(state["lead"]))}
+
+    def estimate(state: ProposalState) -> Dict[str, Any]:
+        requirements = sales_agent.requirements_for(state["lead"])
+        return {"effort_estimate": engineer.get_estimate(requirements, state["project_plan"])}
+
+    async def aestimate(state: ProposalState) -> Dict[str, Any]:
+        requirements = sales_agent.requirements_for(state["lead"])
+        return {"effort_estimate": await engineer.aget_estimate(requirements, state["project_plan"])}
+
+    def cost(state: ProposalState) -> Dict[str, Any]:
+        return {"costs": sales_agent.calculate_costs(state["effort_estimate"])}
+
+    def proposal_inputs(state: ProposalState) -> tuple:
+        return state["lead"], state["project_plan"], state["effort_estimate"], state["costs"]
+
+    def finish(state: ProposalState, chunks: List[str]) -> Dict[str, Any]:
+        proposal = "".join(chunks)
+        return {"proposal": proposal, "messages": [*state.get("messages", []), AIMessage(content=proposal)]}
+
+    def write_proposal(state: ProposalState, writer: StreamWriter) -> Dict[str, Any]:
+        chunks = []
+        for chunk in sales_agent.stream_proposal(*proposal_inputs(state)):
+            writer(chunk)
+            chunks.append(chunk)
+        return finish(state, chunks)
+
+    async def awrite_proposal(state: ProposalState, writer: StreamWriter) -> Dict[str, Any]:
+        chunks = []
+        async for chunk in sales_agent.astream_proposal(*proposal_inputs(state)):
+            writer(chunk)
+            chunks.append(chunk)
+        return finish(state, chunks)
+
+    workflow = StateGraph(ProposalState)
+    workflow.add_node("extract_id", RunnableCallable(extract_id, aextract_id))
+    workflow.add_node("fetch_lead", RunnableCallable(fetch_lead, afetch_lead))
+    workflow.add_node("analyze", RunnableCallable(analyze, aanalyze))
+    workflow.add_node("estimate", RunnableCallable(estimate, aestimate))
+    workflow.add_node("cost", RunnableCallable(cost, None))
+    workflow.add_node("write_proposal", RunnableCallable(write_proposal, awrite_proposal))
+    workflow.add_edge(START, "extract_id")
+    workflow.add_edge("extract_id", "fetch_lead")
+    workflow.add_edge("fetch_lead", "analyze")
+    workflow.add_edge("analyze", "estimate")
+    workflow.add_edge("estimate", "cost")
+    workflow.add_edge("cost", "write_proposal")
+    workflow.add_edge("write_proposal", END)
+    return workflow.compile(checkpointer=checkpointer)
+
+# One run per thread at a time; a second request for the same lead waits and then
+# finds the plan and estimate already cached
+_thread_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+_sync_thread_locks: "weakref.WeakValueDictionary[str, threading.Lock]" = weakref.WeakValueDictionary()
+_sync_thread_locks_lock = threading.Lock()
+
+def _thread_lock(thread_id: str) -> asyncio.Lock:
+    lock = _thread_locks.get(thread_id)
+    if lock is None:
+        lock = _thread_locks[thread_id] = asyncio.Lock()
+    return lock
+
+def _sync_thread_lock(thread_id: str) -> threading.Lock:
+    with _sync_thread_locks_lock:
+        lock = _sync_thread_locks.get(thread_id)
+        if lock is None:
+            lock = _sync_thread_locks[thread_id] = threading.Lock()
+        return lock
+
+def _thread_config(thread_id: str) -> RunnableConfig:
+    return {"configurable": {"thread_id": thread_id}}
+
+async def _start(graph: CompiledStateGraph, state: ProposalState, thread_id: str) -> Optional[ProposalState]:
+    """None, to resume the thread's unfinished run, or the state that starts a new one"""
+    if graph.checkpointer is None:
+        return state
+    return None if (await graph.aget_state(_thread_config(thread_id))).next else state
+
+def _start_sync(graph: CompiledStateGraph, state: ProposalState, thread_id: str) -> Optional[ProposalState]:
+    if graph.checkpointer is None:
+        return state
+    return None if graph.get_state(_thread_config(thread_id)).next else state
+
+def stream_proposal(graph: CompiledStateGraph, state: ProposalState, thread_id: str) -> Iterator[str]:
+    """Stream a proposal from a synchronous caller; see astream_proposal"""
+    with _sync_thread_lock(thread_id):
+        start = _start_sync(graph, state, thread_id)
+        with span("sales.proposal_workflow", thread_id=thread_id, resumed=start is None):
+            yield from graph.stream(start, _thread_config(thread_id), stream_mode="custom")
+        if graph.checkpointer is not None:
+            graph.checkpointer.delete_thread(thread_id)
+
+def run_proposal(graph: CompiledStateGraph, state: ProposalState, thread_id: str) -> str:
+    """Write a proposal from a synchronous caller; see arun_proposal"""
+    with _sync_thread_lock(thread_id):
+        start = _start_sync(graph, state, thread_id)
+        with span("sales.proposal_workflow", thread_id=thread_id, resumed=start is None):
+            final = graph.invoke(start, _thread_config(thread_id))
+        if graph.checkpointer is not None:
+            graph.checkpointer.delete_thread(thread_id)
+        return final["proposal"]
+
+async def astream_proposal(graph: CompiledStateGraph, state: ProposalState, thread_id: str) -> AsyncIterator[str]:
+    """Stream a proposal, resuming the thread's unfinished run if it has one
+
+    Once the run completes its checkpoints are deleted, so the database only holds
+    runs that can be resumed.
+    """
+    async with _thread_lock(thread_id):
+        start = await _start(graph, state, thread_id)
+        with span("sales.proposal_workflow", thread_id=thread_id, resumed=start is None):
+            async for chunk in graph.astream(start, _thread_config(thread_id), stream_mode="custom"):
+                yield chunk
+        if graph.checkpointer is not None:
+            await graph.checkpointer.adelete_thread(thread_id)
+
+async def arun_proposal(graph: CompiledStateGraph, state: ProposalState, thread_id: str) -> str:
+    """Write a proposal and return it, resuming the thread's unfinished run if it has one"""
+    async with _thread_lock(thread_id):
+        start = await _start(graph, state, thread_id)
+        with span("sales.proposal_workflow", thread_id=thread_id, resumed=start is None):
+            final = await graph.ainvoke(start, _thread_config(thread_id))
+        if graph.checkpointer is not None:
+            await graph.checkpointer.adelete_thread(thread_id)
+        return final["proposal"]
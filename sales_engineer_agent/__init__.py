@@ -0,0 +1,12 @@
+from typing import TYPE_CHECKING
+from agent_common.lazy import lazy_exports
+
+__all__ = ["EffortEstimate", "SalesEngineerAgent", "create_graph"]
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "EffortEstimate": "sales_engineer_agent.sales_engineer_agent",
+    "SalesEngineerAgent": "sales_engineer_agent.sales_engineer_agent",
+    "create_graph": "sales_engineer_agent.sales_engineer_agent",
+})
+
+if TYPE_CHECKING:
+    from sales_engineer_agent.sales_engineer_agent import EffortEstimate, SalesEngineerAgent, create_graph
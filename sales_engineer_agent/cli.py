@@ -1,11 +1,21 @@
+import sys
+from pathlib import Path
+from typing import Optional
 import typer
 from rich.console import Console
 from rich.panel import Panel
 from rich.markdown import Markdown
 from rich.prompt import Prompt
 from rich.theme import Theme
-from sales_engineer_agent import create_graph
-from langchain_core.messages import HumanMessage
+from rich.live import Live
+from rich.spinner import Spinner
+# Make the agent packages importable when run as a script, e.g. `uv run sales_engineer_agent/cli.py`
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# The package loads its agent, and with it langchain, on first attribute access
+import sales_engineer_agent
+from sales_engineer_agent.estimate_cache import EstimateCache, default_cache_path
+from agent_common.profiling import profiled
+from agent_common.tracing import configure_from_env
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -21,6 +31,17 @@ console = Console(theme=Theme({
 
 app = typer.Typer(help="Sales Engineer Agent - Project estimation assistant")
 
+@app.callback()
+def main(
+    ctx: typer.Context,
+    profile: bool = typer.Option(False, "--profile", help="Print a per-stage timing breakdown after the command"),
+):
+    """Configure tracing for every command"""
+    # Set AGENT_TRACE_FILE to also export every span as JSONL
+    configure_from_env()
+    if profile:
+        ctx.with_resource(profiled(console, f"sales_engineer_agent.{ctx.invoked_subcommand}"))
+
 def display_welcome():
     welcome_md = """
     # 🛠️ Sales Engineer Agent
@@ -35,11 +56,22 @@ def display_welcome():
     """
     console.print(Panel(Markdown(welcome_md), title="Welcome", border_style="blue"))
 
+def stream_response(workflow, query: str, status: str, title: str) -> str:
+    """Render the response live as tokens stream from the workflow"""
+    from langchain_core.messages import HumanMessage
+    response = ""
+    with Live(Spinner("dots", text=status), console=console, refresh_per_second=12) as live:
+        for chunk in workflow.stream({"messages": [HumanMessage(content=query)]}, stream_mode="custom"):
+            response += chunk
+            live.update(Panel(Markdown(response), title=title, border_style="green"))
+        live.update(Panel(Markdown(response), title=title, border_style="green"))
+    return response
+
 @app.command()
 def interactive():
     """Start an interactive session with the Sales Engineer Agent"""
     display_welcome()
-    workflow = create_graph()
+    workflow = sales_engineer_agent.create_graph()
     
     while True:
         try:
@@ -49,12 +81,7 @@ def interactive():
                 console.print("\n[info]Goodbye! 👋[/info]")
                 break
                 
-            with console.status("[bold blue]Analyzing requirements...[/bold blue]"):
-                state = {"messages": [HumanMessage(content=query)]}
-                final_state = workflow.invoke(state)
-                response = final_state["messages"][-1].content
-            
-            console.print(Panel(Markdown(response), title="Analysis & Estimation", border_style="green"))
+            stream_response(workflow, query, "[bold blue]Analyzing requirements...[/bold blue]", "Analysis & Estimation")
             
         except Exception as e:
             console.print(f"[error]Error: {str(e)}[/error]")
@@ -63,19 +90,27 @@ def interactive():
 @app.command()
 def analyze(requirements: str):
     """Analyze a single project and exit"""
-    workflow = create_graph()
+    workflow = sales_engineer_agent.create_graph()
     
     try:
-        with console.status("[bold blue]Analyzing requirements...[/bold blue]"):
-            state = {"messages": [HumanMessage(content=requirements)]}
-            final_state = workflow.invoke(state)
-            response = final_state["messages"][-1].content
-        
-        console.print(Panel(Markdown(response), title="Analysis & Estimation", border_style="green"))
+        stream_response(workflow, requirements, "[bold blue]Analyzing requirements...[/bold blue]", "Analysis & Estimation")
         
     except Exception as e:
         console.print(f"[error]Error: {str(e)}[/error]")
         raise typer.Exit(code=1)
 
+@app.command("invalidate-cache")
+def invalidate_cache(
+    requirements: Optional[str] = typer.Argument(None, help="Requirements whose cached plan to drop, e.g. 'Cloud migration'"),
+    all_entries: bool = typer.Option(False, "--all", help="Drop every cached plan and estimate"),
+):
+    """Remove cached project plans and estimates"""
+    if requirements is None and not all_entries:
+        console.print("[error]Error: pass the requirements to invalidate or --all[/error]")
+        raise typer.Exit(code=1)
+    cache = EstimateCache(default_cache_path(), prompt_version=sales_engineer_agent.SalesEngineerAgent.PROMPT_VERSION)
+    removed = cache.invalidate(requirements)
+    console.print(f"[success]Removed {removed} cached estimate(s); {len(cache)} remain[/success]")
+
 if __name__ == "__main__":
     app() 
\ No newline at end of file
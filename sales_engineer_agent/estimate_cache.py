@@ -0,0 +1,117 @@
+from typing import Optional, Tuple
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from agent_common.tracing import span
+
+DEFAULT_PATH = "sales_engineer_agent/estimate_cache.db"
+
+def default_cache_path() -> str:
+    """Resolve the cache location from ESTIMATE_CACHE_PATH"""
+    return os.getenv("ESTIMATE_CACHE_PATH", DEFAULT_PATH)
+
+def normalize_requirements(requirements: str) -> str:
+    """Normalise requirements text so trivial variations share a cache entry"""
+    requirements = re.sub(r"\s+", " ", requirements.strip().lower())
+    return requirements.rstrip(" .?!")
+
+class EstimateCache:
+    """Persistent, content-addressed cache of project plans and effort estimates
+
+    Entries are addressed by a hash of the normalised requirements, the model and
+    the prompt version, so changing either of the latter two never serves a stale
+    answer. Leads only span a handful of need categories, so a batch of proposals
+    resolves to a handful of entries. The least recently used entries are evicted
+    once `max_entries` is exceeded.
+    """
+
+    def __init__(self, path: str, model: Optional[str] = None, prompt_version: str = "", max_entries: int = 1000):
+        self.model = model or ""
+        self.prompt_version = prompt_version
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS estimate_cache (
+                key TEXT PRIMARY KEY,
+                requirements TEXT,
+                model TEXT,
+                prompt_version TEXT,
+                project_plan TEXT,
+                estimation TEXT,
+                created_at REAL,
+                last_used REAL
+            )
+        """)
+        # Entries made with an older prompt can never be served again
+        self.conn.execute("DELETE FROM estimate_cache WHERE prompt_version != ?", [prompt_version])
+        self.conn.commit()
+
+    def key(self, requirements: str) -> str:
+        """Content address of an entry for the given requirements"""
+        content = "\0".join([normalize_requirements(requirements), self.model, self.prompt_version])
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def get(self, requirements: str) -> Optional[Tuple[str, str]]:
+        """Return the cached (project plan, estimation), or None on a miss"""
+        key = self.key(requirements)
+        with self._lock, span("estimate_cache.get") as s:
+            row = self.conn.execute(
+                "SELECT project_plan, estimation FROM estimate_cache WHERE key = ?", [key]
+            ).fetchone()
+            s.set(hit=row is not None)
+            if row is None:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE estimate_cache SET last_used = ? WHERE key = ?", [time.time(), key])
+            self.conn.commit()
+            self.hits += 1
+            return row
+
+    def put(self, requirements: str, project_plan: str, estimation: str):
+        """Store a plan and estimation, evicting the least recently used entries"""
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                """INSERT INTO estimate_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    project_plan = excluded.project_plan,
+                    estimation = excluded.estimation,
+                    last_used = excluded.last_used""",
+                [
+                    self.key(requirements), normalize_requirements(requirements), self.model,
+                    self.prompt_version, project_plan, estimation, now, now,
+                ],
+            )
+            self.conn.execute(
+                """DELETE FROM estimate_cache WHERE key IN (
+                    SELECT key FROM estimate_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )""",
+                [self.max_entries],
+            )
+            self.conn.commit()
+
+    def invalidate(self, requirements: Optional[str] = None) -> int:
+        """Remove the entries for some requirements, under any model, or every entry
+
+        Returns the number of entries removed.
+        """
+        with self._lock:
+            if requirements is None:
+                cursor = self.conn.execute("DELETE FROM estimate_cache")
+            else:
+                cursor = self.conn.execute(
+                    "DELETE FROM estimate_cache WHERE requirements = ?", [normalize_requirements(requirements)]
+                )
+            self.conn.commit()
+            return cursor.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM estimate_cache").fetchone()[0]
@@ -1,81 +1,343 @@
-from typing import Dict, Any
-from langgraph.graph import Graph
-import os
-from langchain_core.messages import HumanMessage, AIMessage
-from langchain_openai import ChatOpenAI
+from __future__ import annotations
+from typing import TYPE_CHECKING, Dict, Any, Awaitable, Callable, Iterator, AsyncIterator, List, Optional, Tuple
+from functools import cached_property
+import asyncio
+from pydantic import BaseModel, Field, field_validator
+from agent_common.prompts import get_prompt, prompt_version
+from agent_common.routing import models_for
+from agent_common.tokens import token_ledger
+from agent_common.tracing import span, traced
+from sales_engineer_agent.estimate_cache import EstimateCache, default_cache_path
+
+if TYPE_CHECKING:
+    from langchain_core.output_parsers import PydanticOutputParser
+    from langchain_core.runnables import Runnable
+    from langgraph.graph import Graph
+
+# Roles an estimate may staff; the sales agent's pay scale has a daily rate for each
+ROLES = (
+    "Junior Engineer",
+    "Senior Engineer",
+    "Tech Lead",
+    "Project Manager",
+    "DevOps Engineer",
+    "QA Engineer",
+)
+
+class Staffing(BaseModel):
+    role: str = Field(description=f"One of: {', '.join(ROLES)}")
+    days: float = Field(ge=0, description="Person-days this role works in the phase")
+
+    @field_validator("role")
+    @classmethod
+    def known_role(cls, role: str) -> str:
+        """Accept role names in any case, but only the roles we have rates for"""
+        for known in ROLES:
+            if role.strip().lower() == known.lower():
+                return known
+        raise ValueError(f"Unknown role {role!r}; expected one of {', '.join(ROLES)}")
+
+class Phase(BaseModel):
+    name: str
+    staffing: List[Staffing]
+
+    @property
+    def days(self) -> float:
+        return sum(s.days for s in self.staffing)
+
+class EffortEstimate(BaseModel):
+    phases: List[Phase]
+    risks: List[str] = Field(default_factory=list, description="Risk factors that could affect the timeline")
+
+    @property
+    def days(self) -> float:
+        return sum(phase.days for phase in self.phases)
+
+    def to_markdown(self) -> str:
+        """Render the estimate as a per-phase staffing breakdown"""
+        lines = []
+        for phase in self.phases:
+            lines.append(f"**{phase.name}** ({phase.days:g} person-days)")
+            lines.extend(f"- {s.role}: {s.days:g} days" for s in phase.staffing)
+            lines.append("")
+        lines.append(f"**Total effort:** {self.days:g} person-days")
+        if self.risks:
+            lines.append("\n**Risks**")
+            lines.extend(f"- {risk}" for risk in self.risks)
+        return "\n".join(lines)
+
+    def to_brief(self) -> str:
+        """One line per phase with its staffing, for passing between agents"""
+        lines = [
+            f"{phase.name}: {phase.days:g} days ({', '.join(f'{s.role} {s.days:g}' for s in phase.staffing)})"
+            for phase in self.phases
+        ]
+        lines.append(f"Total: {self.days:g} person-days")
+        if self.risks:
+            lines.append(f"Risks: {'; '.join(self.risks)}")
+        return "\n".join(lines)
 
 class SalesEngineerAgent:
-    def __init__(self):
-        self.llm = ChatOpenAI(
-            model=os.getenv("OPENAI_MODEL"),
-            base_url=os.getenv("OPENAI_BASE_URL"),
-            api_key=os.getenv("OPENAI_API_KEY"),
-        )
+    # Versions of the analysis and estimation prompts; cached plans and estimates
+    # made with other versions are no longer served
+    PROMPT_VERSION = prompt_version("engineer.analysis", "engineer.estimate")
+    # Most tokens the requirements and the plan may take in their prompts
+    PROMPT_BUDGETS = {
+        "analysis.requirements": 1000,
+        "estimate.plan": 1500,
+    }
+    
+    def __init__(self, cache_path: Optional[str] = None, use_cache: bool = True):
+        self.cache = None
+        if use_cache:
+            self.cache = EstimateCache(
+                cache_path or default_cache_path(),
+                model=models_for("analysis", "estimate"),
+                prompt_version=self.PROMPT_VERSION,
+            )
+        # Computations in flight, so concurrent requests for the same requirements share one
+        self._pending: Dict[Tuple[str, str], asyncio.Future] = {}
+        # Plans whose estimate is still being made, so later requests need not plan again
+        self._plans: Dict[str, str] = {}
+
+    @cached_property
+    def llm(self) -> Runnable:
+        """Chat model for project plans, created on first use so commands that never call it skip loading langchain"""
+        from agent_common.llm import chat_model
+        return chat_model("analysis")
+
+    @cached_property
+    def estimate_llm(self) -> Runnable:
+        """Chat model for effort estimates, created on first use"""
+        from agent_common.llm import chat_model
+        return chat_model("estimate")
+
+    @cached_property
+    def estimate_parser(self) -> PydanticOutputParser:
+        """Parser for the JSON effort estimate, created on first use"""
+        from langchain_core.output_parsers import PydanticOutputParser
+        return PydanticOutputParser(pydantic_object=EffortEstimate)
         
+    def _analysis_messages(self, query: str) -> List[tuple]:
+        """Build the messages that turn client requirements into a project plan"""
+        requirements = token_ledger.compact("analysis.requirements", query, budget=self.PROMPT_BUDGETS.get("analysis.requirements"))
+        return get_prompt("engineer.analysis").messages({}, requirements=requirements)
+
+    def _estimate_messages(self, project_plan: str) -> List[tuple]:
+        """Build the messages that estimate effort for a project plan"""
+        context = {"roles": ", ".join(ROLES), "format_instructions": self.estimate_parser.get_format_instructions()}
+        project_plan = token_ledger.compact("estimate.plan", project_plan, budget=self.PROMPT_BUDGETS.get("estimate.plan"))
+        return get_prompt("engineer.estimate").messages(context, project_plan=project_plan)
+
+    @traced("engineer.analyze_requirements")
     def analyze_requirements(self, query: str) -> str:
         """Break down the requirements and create a detailed project plan"""
-        prompt = f"""You are an expert software engineer helping the sales team with project estimation.
-        Given the following client requirements, create a detailed project plan.
-        Break it down into phases and specific tasks.
-        
-        Requirements: {query}
-        
-        Format your response as:
-        1. Project Overview
-        2. Technical Requirements
-        3. Project Phases (with subtasks)
-        4. Technical Considerations
-        """
-        
-        messages = [HumanMessage(content=prompt)]
+        messages = self._analysis_messages(query)
         return self.llm.invoke(messages).content
 
-    def estimate_effort(self, project_plan: str) -> str:
-        """Estimate the effort in man-days based on the project plan"""
-        prompt = f"""Based on the following project plan, estimate:
-        1. Number of engineers needed
-        2. Time required for each phase
-        3. Total effort in man-days
-        4. Any risk factors that could affect the timeline
-        
-        Project Plan:
-        {project_plan}
-        
-        Provide a detailed breakdown of your estimation, explaining your reasoning.
-        """
-        
-        messages = [HumanMessage(content=prompt)]
-        return self.llm.invoke(messages).content
+    @traced("engineer.analyze_requirements")
+    async def aanalyze_requirements(self, query: str) -> str:
+        """Break down the requirements without blocking the event loop"""
+        messages = self._analysis_messages(query)
+        response = await self.llm.ainvoke(messages)
+        return response.content
 
-    def run(self, query: str) -> str:
-        """Process a project requirements query and provide estimation"""
-        project_plan = self.analyze_requirements(query)
-        estimation = self.estimate_effort(project_plan)
-        
-        # Combine the plan and estimation into a complete response
-        response = f"""# Project Analysis and Estimation
+    @traced("engineer.estimate_effort")
+    def estimate_effort(self, project_plan: str) -> EffortEstimate:
+        """Estimate the person-days per role and phase for the project plan"""
+        messages = self._estimate_messages(project_plan)
+        return self.estimate_parser.parse(self.estimate_llm.invoke(messages).content)
+
+    @traced("engineer.estimate_effort")
+    async def aestimate_effort(self, project_plan: str) -> EffortEstimate:
+        """Estimate the effort without blocking the event loop"""
+        messages = self._estimate_messages(project_plan)
+        response = await self.estimate_llm.ainvoke(messages)
+        return self.estimate_parser.parse(response.content)
+
+    @staticmethod
+    def combine(project_plan: str, estimate: EffortEstimate) -> str:
+        """Combine the plan and estimate into a complete response"""
+        return f"""# Project Analysis and Estimation
 
 ## Project Plan
 {project_plan}
 
 ## Effort Estimation
-{estimation}
+{estimate.to_markdown()}
 """
-        return response
+
+    def _cached(self, query: str) -> Optional[Tuple[str, EffortEstimate]]:
+        """Look up a cached plan and estimate for the requirements"""
+        cached = self.cache.get(query) if self.cache is not None else None
+        if cached is None:
+            return None
+        project_plan, estimate = cached
+        return project_plan, EffortEstimate.model_validate_json(estimate)
+
+    def _store(self, query: str, project_plan: str, estimate: EffortEstimate):
+        if self.cache is not None:
+            self.cache.put(query, project_plan, estimate.model_dump_json())
+            self._plans.pop(self.cache.key(query), None)
+
+    async def _acached(self, query: str) -> Optional[Tuple[str, EffortEstimate]]:
+        """Look up a cached plan and estimate without blocking the event loop on SQLite"""
+        if self.cache is None:
+            return None
+        return await asyncio.to_thread(self._cached, query)
+
+    async def _astore(self, query: str, project_plan: str, estimate: EffortEstimate):
+        if self.cache is not None:
+            await asyncio.to_thread(self._store, query, project_plan, estimate)
+
+    async def _shared(self, key: Tuple[str, str], compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Await a computation, joining one already in flight for the same key"""
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(compute())
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        # Shield the shared task so one cancelled caller does not cancel the others
+        return await asyncio.shield(task)
+
+    def get_plan(self, query: str) -> str:
+        """Return the project plan for the requirements, from the cache when possible"""
+        cached = self._cached(query)
+        if cached is not None:
+            return cached[0]
+        return self.analyze_requirements(query)
+
+    async def aget_plan(self, query: str) -> str:
+        """Return the project plan, sharing any analysis of the same requirements in flight"""
+        cached = await self._acached(query)
+        if cached is not None:
+            return cached[0]
+        if self.cache is None:
+            return await self.aanalyze_requirements(query)
+        key = self.cache.key(query)
+        if key in self._plans:
+            return self._plans[key]
+
+        async def analyze() -> str:
+            self._plans[key] = await self.aanalyze_requirements(query)
+            return self._plans[key]
+        return await self._shared(("plan", key), analyze)
+
+    def get_estimate(self, query: str, project_plan: str) -> EffortEstimate:
+        """Return the effort estimate for a plan, caching the pair under the requirements"""
+        cached = self._cached(query)
+        if cached is not None:
+            return cached[1]
+        estimate = self.estimate_effort(project_plan)
+        self._store(query, project_plan, estimate)
+        return estimate
+
+    async def aget_estimate(self, query: str, project_plan: str) -> EffortEstimate:
+        """Return the effort estimate, sharing any estimate of the same requirements in flight"""
+        cached = await self._acached(query)
+        if cached is not None:
+            return cached[1]
+        if self.cache is None:
+            return await self.aestimate_effort(project_plan)
+
+        async def estimate_and_store() -> EffortEstimate:
+            estimate = await self.aestimate_effort(project_plan)
+            await self._astore(query, project_plan, estimate)
+            return estimate
+        return await self._shared(("estimate", self.cache.key(query)), estimate_and_store)
+
+    def plan_and_estimate(self, query: str) -> Tuple[str, EffortEstimate]:
+        """Return the project plan and effort estimate, from the cache when possible"""
+        project_plan = self.get_plan(query)
+        return project_plan, self.get_estimate(query, project_plan)
+
+    async def aplan_and_estimate(self, query: str) -> Tuple[str, EffortEstimate]:
+        """Return the project plan and effort estimate without blocking the event loop"""
+        project_plan = await self.aget_plan(query)
+        return project_plan, await self.aget_estimate(query, project_plan)
+
+    @traced("engineer.run")
+    def run(self, query: str) -> str:
+        """Process a project requirements query and provide estimation"""
+        return self.combine(*self.plan_and_estimate(query))
+
+    @traced("engineer.run")
+    async def arun(self, query: str) -> str:
+        """Process a project requirements query asynchronously"""
+        return self.combine(*await self.aplan_and_estimate(query))
+
+    @traced("engineer.run")
+    def stream(self, query: str) -> Iterator[str]:
+        """Process a project requirements query, streaming the plan and estimation"""
+        cached = self._cached(query)
+        if cached is not None:
+            yield self.combine(*cached)
+            return
+        yield "# Project Analysis and Estimation\n\n## Project Plan\n"
+        plan_chunks = []
+        with span("engineer.analyze_requirements"):
+            for chunk in self.llm.stream(self._analysis_messages(query)):
+                plan_chunks.append(chunk.content)
+                yield chunk.content
+        yield "\n\n## Effort Estimation\n"
+        project_plan = "".join(plan_chunks)
+        # The estimate is structured output, so it is rendered once it is complete
+        estimate = self.estimate_effort(project_plan)
+        yield estimate.to_markdown() + "\n"
+        self._store(query, project_plan, estimate)
+
+    @traced("engineer.run")
+    async def astream(self, query: str) -> AsyncIterator[str]:
+        """Process a project requirements query, streaming asynchronously"""
+        cached = await self._acached(query)
+        if cached is not None:
+            yield self.combine(*cached)
+            return
+        yield "# Project Analysis and Estimation\n\n## Project Plan\n"
+        plan_chunks = []
+        with span("engineer.analyze_requirements"):
+            async for chunk in self.llm.astream(self._analysis_messages(query)):
+                plan_chunks.append(chunk.content)
+                yield chunk.content
+        yield "\n\n## Effort Estimation\n"
+        project_plan = "".join(plan_chunks)
+        # The estimate is structured output, so it is rendered once it is complete
+        estimate = await self.aestimate_effort(project_plan)
+        yield estimate.to_markdown() + "\n"
+        await self._astore(query, project_plan, estimate)
 
 def create_graph() -> Graph:
     """Create the langgraph workflow"""
+    # Imported here so that commands which never build a graph skip loading langgraph
+    from langchain_core.messages import AIMessage
+    from langgraph.graph import Graph
+    from langgraph.types import StreamWriter
+    from langgraph.utils.runnable import RunnableCallable
     sales_engineer = SalesEngineerAgent()
     
-    def process_message(state: Dict[str, Any]):
+    def process_message(state: Dict[str, Any], writer: StreamWriter):
+        query = state["messages"][-1].content
+        chunks = []
+        with span("sales_engineer_agent.graph", query=query):
+            for chunk in sales_engineer.stream(query):
+                writer(chunk)
+                chunks.append(chunk)
+        state["messages"].append(AIMessage(content="".join(chunks)))
+        return state
+    
+    async def aprocess_message(state: Dict[str, Any], writer: StreamWriter):
         query = state["messages"][-1].content
-        response = sales_engineer.run(query)
-        state["messages"].append(AIMessage(content=response))
+        chunks = []
+        with span("sales_engineer_agent.graph", query=query):
+            async for chunk in sales_engineer.astream(query):
+                writer(chunk)
+                chunks.append(chunk)
+        state["messages"].append(AIMessage(content="".join(chunks)))
         return state
     
     workflow = Graph()
-    workflow.add_node("process_message", process_message)
+    workflow.add_node("process_message", RunnableCallable(process_message, aprocess_message))
     workflow.set_entry_point("process_message")
     workflow.set_finish_point("process_message")
     
-    return workflow.compile() 
\ No newline at end of file
+    return workflow.compile() 
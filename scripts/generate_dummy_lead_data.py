@@ -1,32 +1,16 @@
+import sys
+import time
+from pathlib import Path
 import duckdb
-import random
-from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import typer
 from faker import Faker
+# Make the agent packages importable when run as a script
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from lead_agent.ingest import LeadIngestor
 
-# Initialize Faker for generating realistic data
-fake = Faker()
-
-# Connect to DuckDB (creates a new database if it doesn't exist)
-conn = duckdb.connect('lead_agent/leads.db')
-
-# Create sequence for auto-incrementing ID
-conn.execute("""
-    CREATE SEQUENCE IF NOT EXISTS sales_leads_id_seq;
-""")
-
-# Create the sales_leads table
-conn.execute("""
-    CREATE TABLE IF NOT EXISTS sales_leads (
-        id INTEGER PRIMARY KEY DEFAULT(nextval('sales_leads_id_seq')),
-        customer_name VARCHAR,
-        company VARCHAR,
-        needs VARCHAR,
-        budget DECIMAL,
-        timeline_start DATE,
-        timeline_end DATE,
-        created_at TIMESTAMP
-    )
-""")
+app = typer.Typer(help="Generate dummy sales leads for the lead agent")
 
 # Common business needs
 business_needs = [
@@ -42,39 +26,104 @@ business_needs = [
     "AI/ML integration"
 ]
 
-# Generate 50 dummy leads
-leads = []
-for _ in range(50):
-    # Generate random dates within a reasonable range
-    created_at = fake.date_time_between(start_date='-3M', end_date='now')
-    timeline_start = fake.date_time_between(start_date='now', end_date='+6y')
-    timeline_end = timeline_start + timedelta(days=random.randint(30, 365))
-    
-    # Generate random budget between 10k and 500k
-    budget = round(random.uniform(10000, 500000), 2)
-    
-    lead = (
-        fake.name(),
-        fake.company(),
-        random.choice(business_needs),
-        budget,
-        timeline_start,
-        timeline_end,
-        created_at
-    )
-    leads.append(lead)
+def generate_leads(rows: int, rng: np.random.Generator, names: list, companies: list, as_of: np.datetime64) -> pd.DataFrame:
+    """Generate a batch of leads column by column
+
+    Names and companies are drawn from pre-sampled Faker pools and stored as
+    categoricals, so a batch costs a handful of vectorised NumPy calls rather than
+    one Faker call per field.
+    """
+    now = as_of.astype("datetime64[us]")
+    today = as_of.astype("datetime64[D]")
+
+    # Created within the last three months; projects start within six years and
+    # run for 30 to 365 days
+    created_at = now - rng.integers(0, 90 * 24 * 3600 * 10**6, rows).astype("timedelta64[us]")
+    timeline_start = today + rng.integers(0, 6 * 365, rows).astype("timedelta64[D]")
+    timeline_end = timeline_start + rng.integers(30, 366, rows).astype("timedelta64[D]")
+
+    return pd.DataFrame({
+        "customer_name": pd.Categorical.from_codes(rng.integers(0, len(names), rows), categories=names),
+        "company": pd.Categorical.from_codes(rng.integers(0, len(companies), rows), categories=companies),
+        "needs": pd.Categorical.from_codes(rng.integers(0, len(business_needs), rows), categories=business_needs),
+        # Random budget between 10k and 500k
+        "budget": rng.uniform(10000, 500000, rows).round(2),
+        "timeline_start": timeline_start,
+        "timeline_end": timeline_end,
+        "created_at": created_at,
+    })
+
+@app.command()
+def main(
+    rows: int = typer.Option(50, "--rows", "-n", min=1, help="Number of leads to generate"),
+    seed: int = typer.Option(42, "--seed", help="Random seed, for reproducible datasets"),
+    db_path: str = typer.Option("lead_agent/leads.db", "--db-path", help="DuckDB database to write to"),
+    batch_size: int = typer.Option(1_000_000, "--batch-size", min=1, help="Rows generated and loaded per batch"),
+    pool_size: int = typer.Option(10_000, "--pool-size", min=1, help="Distinct names and companies to sample from"),
+    replace: bool = typer.Option(False, "--replace", help="Drop existing leads before generating"),
+    as_of: str = typer.Option(None, "--as-of", help="Reference date (YYYY-MM-DD) for generated dates, defaults to now"),
+    export_parquet: str = typer.Option(None, "--export-parquet", help="Also export all leads to this directory as Parquet, hive-partitioned by created_month"),
+    index: bool = typer.Option(True, "--index/--no-index", help="Add the new leads to the full-text search index"),
+):
+    """Generate dummy leads and bulk load them into DuckDB"""
+    start = time.perf_counter()
+
+    # Initialize Faker and NumPy with the same seed so the dataset is reproducible
+    fake = Faker()
+    Faker.seed(seed)
+    rng = np.random.default_rng(seed)
+    reference = np.datetime64(as_of) if as_of else np.datetime64("now")
+    # Categories must be unique, so deduplicate the pools
+    names = list(dict.fromkeys(fake.name() for _ in range(pool_size)))
+    companies = list(dict.fromkeys(fake.company() for _ in range(pool_size)))
+
+    # Connect to DuckDB (creates a new database, and its directory, if they don't exist)
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    conn = duckdb.connect(db_path)
+    if replace:
+        conn.execute("DROP TABLE IF EXISTS sales_leads")
+        conn.execute("DROP SEQUENCE IF EXISTS sales_leads_id_seq")
+    # Creates the table and change log; the search index and summaries are
+    # brought up to date once, after the last batch
+    ingestor = LeadIngestor(lambda: conn, update_indexes=False)
+    if replace:
+        ingestor.search_index.drop()
+        ingestor.summaries.drop()
+        ingestor.reset()
+
+    # Load each batch straight from the DataFrame; IDs come from the sequence.
+    # Generated names can repeat, and every generated row is kept.
+    remaining = rows
+    while remaining:
+        batch = generate_leads(min(batch_size, remaining), rng, names, companies, reference)
+        ingestor.ingest(batch, deduplicate=False)
+        remaining -= len(batch)
+
+    # Verify the data
+    result = conn.execute("SELECT COUNT(*) FROM sales_leads").fetchone()
+    elapsed = time.perf_counter() - start
+    print(f"Successfully inserted {rows} leads in {elapsed:.1f}s. The database now holds {result[0]} leads.")
+
+    # Index only the new leads, so searches against the read-only database start instantly.
+    # Without an index, searches scan the leads; `lead_agent/cli.py index` builds it later.
+    if index:
+        start = time.perf_counter()
+        indexed = ingestor.search_index.update()
+        print(f"Added {indexed} leads to the search index in {time.perf_counter() - start:.1f}s.")
+    start = time.perf_counter()
+    summarised = ingestor.summaries.update()
+    print(f"Added {summarised} leads to the summary tables in {time.perf_counter() - start:.1f}s.")
 
-# Insert the dummy data into the table
-conn.executemany("""
-    INSERT INTO sales_leads (
-        customer_name, company, needs, budget, 
-        timeline_start, timeline_end, created_at
-    ) VALUES (?, ?, ?, ?, ?, ?, ?)
-""", leads)
+    if export_parquet:
+        # Point LEADS_SOURCE at "<dir>/**/*.parquet" to query the export in place
+        conn.execute(f"""
+            COPY (SELECT *, strftime(created_at, '%Y-%m') AS created_month FROM sales_leads ORDER BY created_at)
+            TO '{export_parquet.replace("'", "''")}' (FORMAT PARQUET, PARTITION_BY (created_month), OVERWRITE_OR_IGNORE)
+        """)
+        print(f"Exported the leads to {export_parquet}, partitioned by created_month.")
 
-# Verify the data
-result = conn.execute("SELECT COUNT(*) FROM sales_leads").fetchone()
-print(f"Successfully inserted {result[0]} leads into the database.")
+    # Close the connection
+    conn.close()
 
-# Close the connection
-conn.close()
+if __name__ == "__main__":
+    app()